@@ -1,13 +1,11 @@
 # -*- mode: python ; coding: utf-8 -*-
 from PyInstaller.utils.hooks import collect_submodules
-from PyInstaller.utils.hooks import collect_all
 
-datas = []
+datas = [('style.qss', '.')]
 binaries = []
 hiddenimports = ['mido.backends.rtmidi', 'mido.backends.portmidi', 'PyQt5.QtPrintSupport']
-hiddenimports += collect_submodules('PyQt5')
-tmp_ret = collect_all('mido')
-datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
+# mido按名称动态加载后端，只需收集backends子模块；PyQt5由PyInstaller的hook按需收集
+hiddenimports += collect_submodules('mido.backends')
 
 
 a = Analysis(
@@ -19,9 +17,22 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[
+        # 程序只使用QtCore/QtGui/QtWidgets，排除体积较大的Qt模块
+        'PyQt5.QtWebEngine',
+        'PyQt5.QtWebEngineCore',
+        'PyQt5.QtWebEngineWidgets',
+        'PyQt5.Qt3DCore',
+        'PyQt5.Qt3DRender',
+        'PyQt5.QtQuick',
+        'PyQt5.QtQml',
+        'PyQt5.QtMultimedia',
+        'PyQt5.QtBluetooth',
+        'tkinter',
+        'pydoc_data',
+    ],
     noarchive=False,
-    optimize=0,
+    optimize=2,
 )
 pyz = PYZ(a.pure)
 
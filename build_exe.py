@@ -7,22 +7,199 @@ MIDI速度转换程序打包脚本
 
 import os
 import sys
+import re
+import glob
+import hashlib
+import argparse
 import subprocess
 import shutil
+import threading
+from importlib.metadata import distributions
 
-def install_pyinstaller():
-    """安装PyInstaller"""
-    print("正在安装PyInstaller...")
+APP_NAME = 'MIDI速度转换工具'
+SPEC_FILE = f'{APP_NAME}.spec'
+
+# UPX压缩后容易损坏的Qt/Python动态库
+UPX_EXCLUDE = ['Qt5Core.dll', 'Qt5Gui.dll', 'Qt5Widgets.dll', 'python3.dll', f'python3{sys.version_info[1]}.dll']
+
+# 发布模式：单文件exe，启用UPX
+RELEASE_EXE_SECTION = f'''exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    [],
+    name='{APP_NAME}',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude={UPX_EXCLUDE!r},
+    runtime_tmpdir=None,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon='icon.ico'
+)
+'''
+
+# 开发模式：目录形式，不使用UPX，避免每次重新打包压缩
+DEV_EXE_SECTION = f'''exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='{APP_NAME}',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon='icon.ico'
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='{APP_NAME}'
+)
+'''
+
+# 后台删除目录的线程，退出前需要等待完成
+_pending_removals = []
+
+# pip本地缓存与wheel仓库，避免重复编译python-rtmidi等C扩展
+PIP_CACHE_DIR = os.path.abspath('.pip-cache')
+WHEELHOUSE_DIR = os.path.abspath('.wheelhouse')
+
+def normalize_package_name(name):
+    """统一包名格式（小写，下划线/点替换为连字符）"""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+def get_installed_packages():
+    """一次性获取已安装的包名集合（小写）"""
+    return {normalize_package_name(dist.metadata['Name'] or '') for dist in distributions()}
+
+def get_required_packages(use_nuitka=False):
+    """获取打包所需的包：打包工具以及requirements.txt中的运行依赖"""
+    if use_nuitka:
+        packages = ['nuitka', 'ordered-set', 'zstandard']
+    else:
+        packages = ['pyinstaller']
+    if os.path.exists('requirements.txt'):
+        with open('requirements.txt', 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    packages.append(line)
+    return packages
+
+def get_missing_packages(use_nuitka=False):
+    """返回尚未安装的包（保留原始版本约束）"""
+    installed = get_installed_packages()
+    missing = []
+    for requirement in get_required_packages(use_nuitka):
+        name = re.split(r'[<>=!~;\[\s]', requirement, maxsplit=1)[0]
+        if normalize_package_name(name) not in installed:
+            missing.append(requirement)
+    return missing
+
+def get_pip_env():
+    """pip使用的环境变量：启用本地缓存并优先使用wheel"""
+    return {"PIP_CACHE_DIR": PIP_CACHE_DIR, "PIP_PREFER_BINARY": "1"}
+
+def run_pip(*args):
+    """
+    在当前进程中运行pip，省去每次启动新解释器的开销
+    
+    pip不正式支持进程内调用，若导入或运行出现异常则退回子进程方式
+    
+    Args:
+        args: pip命令行参数
+        
+    Returns:
+        pip是否执行成功
+    """
+    pip_env = get_pip_env()
+    old_argv = sys.argv
+    old_env = {key: os.environ.get(key) for key in pip_env}
+    os.environ.update(pip_env)
+    sys.argv = ["pip", *args]
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "pyinstaller"])
-        print("PyInstaller安装成功！")
+        import runpy
+        runpy.run_module("pip", run_name="__main__", alter_sys=True)
         return True
-    except subprocess.CalledProcessError:
-        print("PyInstaller安装失败！")
-        return False
+    except SystemExit as e:
+        return e.code in (0, None)
+    except Exception as e:
+        print(f"进程内调用pip失败（{e}），改用子进程调用")
+        try:
+            subprocess.check_call([sys.executable, "-m", "pip", *args], env={**os.environ, **pip_env})
+            return True
+        except subprocess.CalledProcessError:
+            return False
+    finally:
+        sys.argv = old_argv
+        for key, value in old_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+def install_requirements(packages):
+    """一次pip调用安装所有缺失的包"""
+    print(f"正在安装依赖：{', '.join(packages)}")
+    
+    # pip只有在安装了wheel包时才会缓存从源码构建的wheel
+    if 'wheel' not in get_installed_packages():
+        run_pip("install", "-q", "wheel")
+    
+    # 首次运行时构建本地wheel仓库，之后的安装直接从中获取
+    if not os.path.isdir(WHEELHOUSE_DIR) and os.path.exists('requirements.txt'):
+        run_pip("wheel", "-w", WHEELHOUSE_DIR, "-r", "requirements.txt")
+    
+    find_links = ["--find-links", WHEELHOUSE_DIR] if os.path.isdir(WHEELHOUSE_DIR) else []
+    if run_pip(
+        "install",
+        "--prefer-binary",
+        "--disable-pip-version-check",
+        "--no-input",
+        *find_links,
+        *packages
+    ):
+        print("依赖安装成功！")
+        return True
+    
+    print("依赖安装失败！")
+    return False
 
-def create_spec_file():
-    """创建PyInstaller的spec配置文件"""
+def create_spec_file(release=False):
+    """
+    创建PyInstaller的spec配置文件
+    
+    Args:
+        release: True时生成单文件exe并启用UPX压缩（发布用），
+                 False时生成目录形式且不压缩（开发迭代用，打包更快）
+    """
+    if release:
+        exe_section = RELEASE_EXE_SECTION
+    else:
+        exe_section = DEV_EXE_SECTION
+    
     spec_content = '''# -*- mode: python ; coding: utf-8 -*-
 
 block_cipher = None
@@ -33,6 +210,7 @@ a = Analysis(
     binaries=[],
     datas=[
         ('icon.ico', '.'),
+        ('style.qss', '.'),
         ('icon_16x16.png', '.'),
         ('icon_32x32.png', '.'),
         ('icon_48x48.png', '.'),
@@ -56,65 +234,159 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[
+        # 程序只使用QtCore/QtGui/QtWidgets，排除体积较大的Qt模块
+        'PyQt5.QtWebEngine',
+        'PyQt5.QtWebEngineCore',
+        'PyQt5.QtWebEngineWidgets',
+        'PyQt5.Qt3DCore',
+        'PyQt5.Qt3DRender',
+        'PyQt5.QtQuick',
+        'PyQt5.QtQml',
+        'PyQt5.QtMultimedia',
+        'PyQt5.QtBluetooth',
+        'tkinter',
+        'pydoc_data',
+    ],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
     noarchive=False,
+    # 去除docstring和assert，减小打包体积并加快解压
+    optimize=2,
 )
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='MIDI速度转换工具',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon='icon.ico'
-)
-'''
+{exe_section}'''.replace('{exe_section}', exe_section)
+    
+    # 内容未变化时保留现有spec文件，PyInstaller可复用build目录中的分析缓存
+    if os.path.exists(SPEC_FILE):
+        with open(SPEC_FILE, 'r', encoding='utf-8') as f:
+            if f.read() == spec_content:
+                print("spec配置文件未变化，直接复用")
+                return
     
-    with open('MIDI速度转换工具.spec', 'w', encoding='utf-8') as f:
+    with open(SPEC_FILE, 'w', encoding='utf-8') as f:
         f.write(spec_content)
     
     print("已创建spec配置文件")
 
-def build_exe():
-    """使用PyInstaller打包程序"""
-    print("开始打包程序...")
+def get_output_path(release=False):
+    """打包产物路径：发布模式为单个exe，开发模式为输出目录"""
+    if release:
+        return os.path.join('dist', f'{APP_NAME}.exe')
+    return os.path.join('dist', APP_NAME)
+
+def compute_inputs_hash():
+    """计算所有打包输入（源码、spec、资源文件、依赖列表）的SHA-256摘要"""
+    h = hashlib.sha256()
+    h.update(sys.version.encode())
+    input_files = sorted(glob.glob('*.py')) + sorted(glob.glob('icon*')) + [SPEC_FILE, 'style.qss', 'requirements.txt']
+    for path in input_files:
+        if os.path.isfile(path):
+            h.update(path.encode('utf-8'))
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def build_exe(release=False):
+    """
+    使用PyInstaller打包程序
+    
+    Args:
+        release: 是否为发布模式（单文件exe + UPX）
+    """
+    print(f"开始打包程序（{'发布模式: 单文件' if release else '开发模式: 目录形式'}）...")
+    
+    # spec内容与打包模式相关，按当前模式生成（内容相同则复用）
+    create_spec_file(release)
     
-    # 检查是否存在spec文件
-    if not os.path.exists('MIDI速度转换工具.spec'):
-        create_spec_file()
+    # 输入未变化且产物仍在时跳过PyInstaller
+    inputs_hash = compute_inputs_hash()
+    output_path = get_output_path(release)
+    hash_file = os.path.join('dist', f'{APP_NAME}.inputs')
+    if os.path.exists(output_path) and os.path.exists(hash_file):
+        with open(hash_file, 'r', encoding='utf-8') as f:
+            if f.read().strip() == inputs_hash:
+                print("打包输入未变化，跳过打包（已是最新）")
+                return True
     
     try:
-        # 使用spec文件打包
-        subprocess.check_call([
-            sys.executable, "-m", "PyInstaller", 
-            "--clean",  # 清理临时文件
-            "MIDI速度转换工具.spec"
-        ])
+        # 使用spec文件打包；开发模式不加--clean，保留PyInstaller的分析缓存
+        command = [sys.executable, "-m", "PyInstaller", "--noconfirm"]
+        if release:
+            command.append("--clean")  # 发布时清理临时文件，完整重新分析
+        command.append(SPEC_FILE)
+        subprocess.check_call(command)
+        with open(hash_file, 'w', encoding='utf-8') as f:
+            f.write(inputs_hash)
         print("程序打包成功！")
         return True
     except subprocess.CalledProcessError as e:
         print(f"程序打包失败：{e}")
         return False
 
+def build_exe_nuitka(release=False):
+    """
+    使用Nuitka将程序编译为本地代码（PyInstaller的替代方案）
+    
+    Args:
+        release: 是否生成单文件exe（否则生成standalone目录 dist/main.dist）
+    """
+    print(f"开始使用Nuitka编译程序（{'单文件' if release else 'standalone目录'}）...")
+    
+    command = [
+        sys.executable, "-m", "nuitka",
+        "--standalone",
+        "--lto=yes",
+        "--enable-plugin=pyqt5",
+        "--include-package=mido.backends",
+        "--include-data-files=icon.ico=icon.ico",
+        "--include-data-files=style.qss=style.qss",
+        "--windows-console-mode=disable",
+        "--windows-icon-from-ico=icon.ico",
+        f"--output-filename={APP_NAME}.exe",
+        "--output-dir=dist",
+        "--assume-yes-for-downloads",
+    ]
+    if release:
+        command.append("--onefile")
+    command.append("main.py")
+    
+    try:
+        subprocess.check_call(command)
+        print("程序编译成功！")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"程序编译失败：{e}")
+        return False
+
+def remove_tree_async(path):
+    """
+    先将目录重命名（同卷内几乎瞬间完成），再在后台线程中删除
+    
+    Args:
+        path: 要删除的目录
+    """
+    if not os.path.exists(path):
+        return
+    tmp_path = f"{path}.old.{os.getpid()}"
+    try:
+        os.rename(path, tmp_path)
+    except OSError:
+        # 重命名失败（如文件被占用）时退回同步删除
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    thread = threading.Thread(target=shutil.rmtree, args=(tmp_path,), kwargs={'ignore_errors': True}, daemon=True)
+    thread.start()
+    _pending_removals.append(thread)
+
+def wait_for_removals():
+    """等待所有后台删除完成"""
+    while _pending_removals:
+        _pending_removals.pop().join()
+
 def copy_output_files():
     """复制输出文件到当前目录"""
     dist_dir = "dist"
@@ -127,11 +399,10 @@ def copy_output_files():
                 shutil.copy2(src, dst)
                 print(f"已复制exe文件：{file}")
         
-        # 复制整个dist目录（包含所有依赖）
-        dist_copy_dir = "MIDI速度转换工具_完整版"
-        if os.path.exists(dist_copy_dir):
-            shutil.rmtree(dist_copy_dir)
-        shutil.copytree(dist_dir, dist_copy_dir)
+        # 复制整个dist目录（包含所有依赖），打包输入摘要只供本机判断是否需要重新打包，不随完整版分发
+        dist_copy_dir = f"{APP_NAME}_完整版"
+        remove_tree_async(dist_copy_dir)
+        shutil.copytree(dist_dir, dist_copy_dir, ignore=shutil.ignore_patterns('*.inputs'))
         print(f"已创建完整版目录：{dist_copy_dir}")
         
         return True
@@ -142,45 +413,63 @@ def copy_output_files():
 def clean_build_files():
     """清理构建文件"""
     dirs_to_clean = ['build', '__pycache__']
-    files_to_clean = ['MIDI速度转换工具.spec']
+    files_to_clean = [SPEC_FILE]
     
     for dir_name in dirs_to_clean:
         if os.path.exists(dir_name):
-            shutil.rmtree(dir_name)
+            remove_tree_async(dir_name)
             print(f"已清理目录：{dir_name}")
     
     for file_name in files_to_clean:
         if os.path.exists(file_name):
-            os.remove(file_name)
+            os.unlink(file_name)
             print(f"已清理文件：{file_name}")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="MIDI速度转换程序打包工具")
+    parser.add_argument('--release', action='store_true',
+                        help="生成单文件exe（PyInstaller下同时启用UPX压缩；默认生成目录形式，打包更快）")
+    parser.add_argument('--nuitka', action='store_true',
+                        help="使用Nuitka编译为本地代码代替PyInstaller")
+    args = parser.parse_args()
+    
     print("=== MIDI速度转换程序打包工具 ===")
     print()
     
-    # 检查并安装PyInstaller
-    try:
-        import PyInstaller
-        print("PyInstaller已安装")
-    except ImportError:
-        if not install_pyinstaller():
-            return
+    # 检查并安装打包工具及运行依赖
+    missing = get_missing_packages(args.nuitka)
+    if not missing:
+        print("打包工具及依赖已安装")
+    elif not install_requirements(missing):
+        return
     
     # 打包程序
-    if build_exe():
+    if args.nuitka:
+        success = build_exe_nuitka(args.release)
+    else:
+        success = build_exe(args.release)
+    
+    if success:
         # 复制输出文件
         copy_output_files()
         
         print()
         print("=== 打包完成 ===")
         print("生成的文件：")
-        print("1. MIDI速度转换工具.exe - 主程序")
-        print("2. MIDI速度转换工具_完整版/ - 包含所有依赖的完整版本")
+        if args.release:
+            print(f"1. {APP_NAME}.exe - 主程序")
+        elif args.nuitka:
+            print(f"1. dist/main.dist/{APP_NAME}.exe - 主程序（standalone目录，需与同目录文件一起使用）")
+        else:
+            print(f"1. dist/{APP_NAME}/{APP_NAME}.exe - 主程序（开发模式，需与同目录文件一起使用）")
+        print(f"2. {APP_NAME}_完整版/ - 包含所有依赖的完整版本")
         print()
         print("注意：")
         print("- 主程序exe文件可以直接运行")
         print("- 完整版目录包含所有依赖，可以分发给其他用户")
+        if not args.release:
+            print("- 发布时请使用 --release 生成单文件exe")
         
         # 询问是否清理构建文件
         try:
@@ -190,6 +479,8 @@ def main():
                 print("构建文件已清理")
         except KeyboardInterrupt:
             print("\n用户取消操作")
+        finally:
+            wait_for_removals()
     else:
         print("打包失败，请检查错误信息")
 
@@ -1,83 +1,39 @@
 import sys
 import os
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QIcon
-from ui import MainWindow
+import multiprocessing
 
 def main():
+    # PyQt5和界面模块在main()内导入，推迟Qt动态库的加载
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QFile, QTextStream
+    
     # 创建应用程序
     app = QApplication(sys.argv)
     
     # 设置应用程序样式
     app.setStyle("Fusion")
     
-    # 设置样式表
-    style_sheet = """
-        QMainWindow, QWidget {
-            background-color: #f5f5f5;
-            color: #333333;
-        }
-        QPushButton {
-            background-color: #3498db;
-            color: white;
-            border: none;
-            padding: 8px 16px;
-            border-radius: 4px;
-            font-weight: bold;
-        }
-        QPushButton:hover {
-            background-color: #2980b9;
-        }
-        QPushButton:disabled {
-            background-color: #bdc3c7;
-        }
-        QProgressBar {
-            border: 1px solid #bdc3c7;
-            border-radius: 4px;
-            text-align: center;
-            height: 20px;
-        }
-        QProgressBar::chunk {
-            background-color: #2ecc71;
-            width: 10px;
-            margin: 0.5px;
-        }
-        QTableWidget {
-            gridline-color: #d0d0d0;
-            selection-background-color: #3498db;
-            selection-color: white;
-        }
-        QTableWidget::item {
-            padding: 4px;
-        }
-        QGroupBox {
-            border: 1px solid #bdc3c7;
-            border-radius: 4px;
-            margin-top: 12px;
-            font-weight: bold;
-        }
-        QGroupBox::title {
-            subcontrol-origin: margin;
-            subcontrol-position: top left;
-            left: 10px;
-            padding: 0 5px;
-        }
-    """
-    app.setStyleSheet(style_sheet)
+    # 从style.qss加载样式表
+    qss_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'style.qss')
+    qss_file = QFile(qss_path)
+    if qss_file.open(QFile.ReadOnly | QFile.Text):
+        app.setStyleSheet(QTextStream(qss_file).readAll())
+        qss_file.close()
     
-    # 设置应用程序图标
-    icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icon.ico')
-    if os.path.exists(icon_path):
-        app.setWindowIcon(QIcon(icon_path))
+    # QApplication创建之后再导入界面模块（同时加载midi_processor等依赖）
+    from ui import MainWindow
     
     # 创建主窗口
     window = MainWindow()
     
-    # 显示窗口
+    # 显示窗口，并先完成首次绘制（图标在窗口显示后再加载）
     window.show()
+    app.processEvents()
     
     # 运行应用程序
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
+    # 打包为exe后，批量处理的子进程需要此调用才能正常启动
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
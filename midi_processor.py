@@ -1,16 +1,193 @@
 import os
+import struct
 import mido
-from typing import List, Dict, Tuple, Any, Optional
+from bisect import bisect_right
+from collections import defaultdict, deque, namedtuple
+from collections.abc import Sequence
+from operator import attrgetter, itemgetter
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Any, Optional, Callable, Iterable, Iterator
 import time
 import json
+import itertools
+import pickle
+from fractions import Fraction
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# 视为"控制消息"的消息类型（移除控制消息时一并删除）
+_CC_MSG_TYPES = frozenset({'control_change', 'pitchwheel', 'program_change',
+                           'aftertouch', 'polytouch', 'sysex'})
+# 音符消息类型
+_NOTE_MSG_TYPES = frozenset({'note_on', 'note_off'})
+# 重建MIDI时丢弃的标记类事件
+_MARKER_MSG_TYPES = frozenset({'marker', 'text', 'cue_marker', 'lyrics'})
+# 重建MIDI时不从原轨道复制的事件（音符重新生成，速度重新设置，标记丢弃）
+_REBUILD_SKIP_MSG_TYPES = _NOTE_MSG_TYPES | _MARKER_MSG_TYPES | {'set_tempo'}
+# 音符队列表的大小：16个通道 × 128个音高，下标为 (channel << 7) | note
+_NOTE_SLOT_COUNT = 16 * 128
+# 快速写出时直接编码的通道消息 {消息类型: 状态字节高4位}
+_FAST_STATUS = {'note_on': 0x90, 'note_off': 0x80, 'control_change': 0xB0}
+# 音符按开始时间排序用的key（attrgetter比lambda快）
+_note_start_seconds = attrgetter('start_seconds')
+# 速度事件/速度变化元组按tick（第一个元素）排序用的key
+_first_item = itemgetter(0)
+# 处理重叠后保留的音符最短持续时间（秒），不超过该长度的音符被删除
+_MIN_NOTE_DURATION = 0.001
+# 进程池整体失败时抛出的异常：子进程崩溃，或任务/结果无法pickle
+# （无法pickle的对象会抛出PicklingError、TypeError或AttributeError）
+_POOL_ERRORS = (BrokenProcessPool, pickle.PicklingError, TypeError, AttributeError)
+
+
+@dataclass
+class ScanResult:
+    """单次遍历所有轨道得到的信息，供速度分析、控制消息/力度检查和音符收集共用"""
+    has_cc: bool = False  # 是否包含控制消息
+    has_notes: bool = False  # 是否包含音符（力度>0的note_on）
+    min_velocity: int = 127  # 音符最小力度
+    max_velocity: int = 0  # 音符最大力度
+    tempo_events: List[Tuple[int, int, int]] = field(default_factory=list)  # [(绝对tick, tempo, 轨道索引)]
+    note_pairs_by_track: List[List[Tuple[int, int, int, int, int]]] = field(default_factory=list)  # 每个轨道已配对的音符 [(note, channel, velocity, start_tick, end_tick)]
+    unmatched_notes: int = 0  # 没有找到note_off的note_on数量
+    first_note: Optional[Tuple[int, int]] = None  # 首个音符 (绝对tick, 轨道索引)
+    note_track_count: int = 0  # 包含音符消息（note_on/note_off）的轨道数
+    track_lengths: List[int] = field(default_factory=list)  # 每个轨道的事件数
+
+    def velocities_match(self, target_velocity: int, tolerance: int = 3) -> bool:
+        """所有音符力度是否都在目标力度的误差范围内（没有音符时视为匹配）"""
+        if not self.has_notes:
+            return True
+        return (target_velocity - tolerance <= self.min_velocity and
+                self.max_velocity <= target_velocity + tolerance)
+
+
+# 处理计划：只根据用户选项（不读取文件内容）预先确定需要哪些扫描/输出
+# 类似"提示"枚举：plan为None等同于全部扫描，各项为False时跳过对应的工作
+#   need_cc_scan:    是否需要检查控制消息（仅在移除控制消息时）
+#   need_vel_scan:   是否需要检查音符力度（仅在统一音符力度时）
+#   need_overlap:    是否需要检测音符重叠
+#   need_file_write: 是否可能输出新文件（任何一个处理选项被勾选）
+ProcessingPlan = namedtuple('ProcessingPlan', 'need_cc_scan need_vel_scan need_overlap need_file_write')
+
+
+@dataclass
+class ProcessResult:
+    """process_file 返回的单个文件处理结果"""
+    __slots__ = ('filename', 'original_bpm', 'target_bpm', 'velocity_modified', 'velocity_status',
+                 'cc_removed', 'cc_status', 'overlap_status', 'overlap_details', 'fix_overlap_status',
+                 'tempo_changes', 'note_count', 'status', 'path', 'is_multi_tempo')
+    filename: str  # 文件名
+    original_bpm: Any  # 原始BPM，无速度信息时为"未知"
+    target_bpm: float  # 目标BPM
+    velocity_modified: bool  # 是否勾选统一音符力度
+    velocity_status: str  # 音符力度处理状态
+    cc_removed: bool  # 是否勾选移除控制消息
+    cc_status: str  # 控制消息处理状态
+    overlap_status: str  # 重叠检测状态
+    overlap_details: str  # 重叠详细信息
+    fix_overlap_status: str  # 重叠处理状态
+    tempo_changes: List[Dict[str, Any]]  # 速度变化信息
+    note_count: int  # 音符数量
+    status: str  # 处理状态
+    path: str  # 输出文件路径，无输出文件时为空
+    is_multi_tempo: bool  # 是否为变速MIDI
+
+
+class Note:
+    """
+    单个音符的位置信息
+    
+    使用 __slots__ 代替字典存储：每个音符占用的内存约为字典的三分之一，属性访问也更快，
+    对包含大量音符的MIDI文件收集/检测/处理重叠时更明显
+    """
+    __slots__ = ('track', 'original_track', 'note', 'channel', 'velocity',
+                 'start_tick', 'end_tick', 'start_seconds', 'end_seconds',
+                 'duration_ticks', 'duration_seconds')
+    
+    def __init__(self, track: int, note: int, channel: int, velocity: int,
+                 start_tick: int, end_tick: int, start_seconds: float, end_seconds: float,
+                 original_track: Optional[int] = None):
+        self.track = track
+        self.original_track = track if original_track is None else original_track  # 原始轨道索引
+        self.note = note
+        self.channel = channel
+        self.velocity = velocity
+        self.start_tick = start_tick
+        self.end_tick = end_tick
+        self.start_seconds = start_seconds
+        self.end_seconds = end_seconds
+        self.duration_ticks = end_tick - start_tick
+        self.duration_seconds = end_seconds - start_seconds
+    
+    def copy(self) -> 'Note':
+        """返回音符的副本"""
+        new_note = Note.__new__(Note)
+        for name in Note.__slots__:
+            setattr(new_note, name, getattr(self, name))
+        return new_note
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典（用于导出或调试）"""
+        return {name: getattr(self, name) for name in Note.__slots__}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Note':
+        """从字典创建音符（to_dict 的逆操作，也接受旧版本的音符字典）"""
+        note = cls(data['track'], data['note'], data['channel'], data['velocity'],
+                   data['start_tick'], data['end_tick'], data['start_seconds'], data['end_seconds'],
+                   original_track=data.get('original_track'))
+        # 字典中记录了持续时间时原样保留
+        if 'duration_ticks' in data:
+            note.duration_ticks = data['duration_ticks']
+        if 'duration_seconds' in data:
+            note.duration_seconds = data['duration_seconds']
+        return note
+    
+    def __repr__(self) -> str:
+        return (f"Note(track={self.track}, note={self.note}, channel={self.channel}, "
+                f"start={self.start_seconds:.6f}s, end={self.end_seconds:.6f}s)")
+
+
+class OverlapDescriptions(Sequence):
+    """
+    重叠描述文字的惰性列表
+    
+    只保存重叠详细信息，读取某一项时才格式化对应的描述，
+    重叠很多而调用方只关心数量时不必为每处重叠生成字符串
+    """
+    __slots__ = ('_details', '_format')
+    
+    def __init__(self, details: List[Dict[str, Any]], format_detail: Callable[[Dict[str, Any]], str]):
+        self._details = details
+        self._format = format_detail
+    
+    def __len__(self) -> int:
+        return len(self._details)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._format(detail) for detail in self._details[index]]
+        return self._format(self._details[index])
+    
+    def __repr__(self) -> str:
+        return repr(list(self))
+
 
 class MidiProcessor:
-    def __init__(self):
+    def __init__(self, debug_mode: bool = False):
         self.original_tempo = None
         self.tempo_changes = []
-        self.debug_mode = True  # 启用详细日志输出
+        self._tempo_prefix = []  # 速度前缀表 [(tick位置, 该位置的绝对秒数, 之后的tempo)]
+        self._tempo_prefix_ticks = []  # 速度前缀表的tick列，用于二分查找
+        self._tempo_prefix_tpb = 480  # 建立速度前缀表时使用的ticks_per_beat
+        self.debug_mode = debug_mode  # 是否输出详细日志
         self.detailed_tempos = []  # 存储详细的速度信息
         self.velocity_percent = 80  # 默认力度百分比
+    
+    def _log(self, *args) -> None:
+        """输出详细日志（仅在debug_mode开启时）"""
+        if self.debug_mode:
+            print(*args)
         
     def process_file(self, 
                     input_file: str, 
@@ -23,7 +200,8 @@ class MidiProcessor:
                     keep_original_tempo: bool = True,
                     check_overlap: bool = False,
                     fix_overlap: bool = False,
-                    multitrack_overlap: bool = False) -> Dict[str, Any]:
+                    multitrack_overlap: bool = False,
+                    midi: Optional[mido.MidiFile] = None) -> ProcessResult:
         """
         处理单个MIDI文件
         
@@ -39,12 +217,17 @@ class MidiProcessor:
             check_overlap: 是否检测音符重叠
             fix_overlap: 是否处理重叠音符
             multitrack_overlap: 是否处理跨轨道重叠（True=全局处理，False=分轨道处理）
+            midi: 已预先加载的MIDI对象（为None时从input_file读取）
             
         Returns:
-            包含处理结果信息的字典
+            ProcessResult 处理结果（需要字典时可使用 dataclasses.asdict）
         """
+        # 输出文件名和输出路径只计算一次，各分支共用
+        filename = os.path.basename(input_file)
+        default_output_path = os.path.join(output_dir, filename)
+        
         try:
-            print(f"\n开始处理文件: {input_file}")
+            self._log(f"\n开始处理文件: {input_file}")
             
             # 设置力度百分比
             self.velocity_percent = velocity_percent
@@ -54,16 +237,53 @@ class MidiProcessor:
             self.tempo_changes = []
             self.detailed_tempos = []
             
-            # 加载MIDI文件
-            midi = mido.MidiFile(input_file)
-            print(f"MIDI格式: {midi.type}, Ticks per beat: {midi.ticks_per_beat}")
+            # 加载MIDI文件（批量处理时可能已由预读线程加载）
+            if midi is None:
+                midi = mido.MidiFile(input_file)
+            self._log(f"MIDI格式: {midi.type}, Ticks per beat: {midi.ticks_per_beat}")
+            
+            # 根据选项确定处理计划
+            plan = ProcessingPlan(
+                need_cc_scan=remove_cc,
+                need_vel_scan=set_velocity,
+                need_overlap=check_overlap,
+                need_file_write=keep_original_tempo or remove_cc or set_velocity or fix_overlap
+            )
+            
+            # 一次遍历所有轨道，收集速度、控制消息、力度和音符信息
+            scan = self._scan_tracks(midi, plan)
             
             # 分析原始速度信息 - 直接从文件中读取
-            print("\n===== 原始MIDI分析 =====")
-            self._analyze_tempo(midi)
+            self._log("\n===== 原始MIDI分析 =====")
+            self._analyze_tempo(midi, scan)
+            
+            # 原始BPM只计算一次（无速度信息时为None）
+            original_bpm_value = self._tempo_to_bpm(self.original_tempo) if self.original_tempo else None
+            result_original_bpm = original_bpm_value if original_bpm_value is not None else "未知"
+            
+            # 没有勾选任何处理选项也不检测重叠时，不可能输出文件，直接返回
+            if not plan.need_file_write and not plan.need_overlap:
+                self._log("\n===== 无需处理，不输出文件 =====")
+                return ProcessResult(
+                    filename=filename,
+                    original_bpm=result_original_bpm,
+                    target_bpm=target_bpm,
+                    velocity_modified=set_velocity,
+                    velocity_status="未处理",
+                    cc_removed=remove_cc,
+                    cc_status="未处理",
+                    overlap_status="未检测",
+                    overlap_details="",
+                    fix_overlap_status="未处理",
+                    tempo_changes=self._build_tempo_info(),
+                    note_count=sum(len(note_pairs) for note_pairs in scan.note_pairs_by_track),
+                    status="无需处理",
+                    path="",
+                    is_multi_tempo=len(set(tempo for _, tempo in self.tempo_changes)) > 1
+                )
             
             # 计算实际力度值 (将百分比正确转换为MIDI力度值，范围1-127)
-            target_velocity = min(127, max(1, int(127 * velocity_percent / 100)))
+            target_velocity = self._percent_to_velocity(velocity_percent)
 
             # 检查是否需要处理
             needs_processing = True
@@ -79,7 +299,7 @@ class MidiProcessor:
                 has_multiple_tempos = len(unique_tempos) > 1
                 
             # 检查原始BPM是否与目标BPM一致（仅对非变速MIDI进行检查）
-            original_bpm = self._tempo_to_bpm(self.original_tempo) if self.original_tempo else 120
+            original_bpm = original_bpm_value if original_bpm_value is not None else 120
             bpm_matches = False
             
             # 只有当MIDI有且仅有一个速度信息，且该速度与目标速度一致时，才认为BPM匹配
@@ -91,53 +311,17 @@ class MidiProcessor:
                 bpm_matches = False
             
             # 检查文件是否包含任何控制消息
-            has_cc_messages = False
-            for track in midi.tracks:
-                for msg in track:
-                    if msg.type in ['control_change', 'pitchwheel', 'program_change', 
-                                  'aftertouch', 'polytouch', 'sysex']:
-                        has_cc_messages = True
-                        break
-                if has_cc_messages:
-                    break
+            has_cc_messages = scan.has_cc
             
-            # 检查音符力度是否已经是目标力度
-            all_notes_match_velocity = True
-            has_notes = False
-            for track in midi.tracks:
-                for msg in track:
-                    if msg.type == 'note_on' and msg.velocity > 0:
-                        has_notes = True
-                        if abs(msg.velocity - target_velocity) > 3:  # 允许小误差
-                            all_notes_match_velocity = False
-                            break
-                if has_notes and not all_notes_match_velocity:
-                    break
+            # 检查音符力度是否已经是目标力度（允许小误差）
+            all_notes_match_velocity = scan.velocities_match(target_velocity)
             
             # 根据检查结果确定处理状态
             if bpm_matches:
                 # 原始BPM与目标BPM匹配的情况
-                
-                # 1. 已勾选移除控制消息，但MIDI内不含控制信息
-                if remove_cc and not has_cc_messages:
-                    cc_status = "无需处理"
-                
-                # 2. 勾选了移除控制消息，且MIDI内包含控制消息需要移除
-                elif remove_cc and has_cc_messages:
-                    cc_status = "已处理"
-                
-                # 3. 未勾选移除控制消息
-                else:  # not remove_cc
-                    cc_status = "未处理"
-                    
-                # 设置音符力度状态
-                if set_velocity:
-                    if all_notes_match_velocity:
-                        velocity_status = "无需处理"
-                    else:
-                        velocity_status = "已处理"
-                else:
-                    velocity_status = "未处理"
+                cc_status, velocity_status = self._compute_statuses(
+                    remove_cc, has_cc_messages, set_velocity, all_notes_match_velocity, skipped=False
+                )
                 
                 # 如果BPM匹配且勾选了跳过匹配文件，则检查是否需要处理控制信息
                 if skip_matched:
@@ -146,147 +330,28 @@ class MidiProcessor:
                     
                     # 只有当不需要处理控制信息时，才跳过处理
                     if not needs_cc_processing:
-                        print(f"文件不需要处理: BPM已匹配 ({original_bpm} BPM), 无控制信息需移除")
-                        
-                        # 初始化重叠处理文件保存标志
-                        needs_overlap_file_save = False
+                        self._log(f"文件不需要处理: BPM已匹配 ({original_bpm} BPM), 无控制信息需移除")
                         
                         # 收集所有原始音符的绝对秒位置(仅用于信息返回)
-                        note_positions = self._collect_note_positions(midi)
-                        
-                        # 检测音符重叠（即使文件不需要处理，也要检测重叠）
-                        fix_overlap_status = "未处理"
-                        overlap_status = "未检测"
-                        overlap_details = ""
+                        note_positions = self._collect_note_positions(midi, scan)
                         
-                        if check_overlap:
-                            print("\n===== 检测音符重叠 =====")
-                            
-                            # 检测是否为多轨道MIDI文件
-                            track_count = len(midi.tracks)
-                            has_multiple_note_tracks = sum(1 for track in midi.tracks if any(msg.type in ['note_on', 'note_off'] for msg in track)) > 1
-                            
-                            if has_multiple_note_tracks:
-                                print(f"检测到多轨道MIDI文件（{track_count}个轨道）")
-                                
-                                if multitrack_overlap:
-                                    # 用户明确启用了跨轨道处理，使用全局模式
-                                    print("用户启用了跨轨道重叠处理，使用全局模式")
-                                    overlap_result = self.detect_multitrack_overlaps(input_file)
-                                    if overlap_result['has_overlap']:
-                                        overlap_status = f"多轨全局重叠 ({overlap_result['total_overlaps']} 处)"
-                                        overlap_details = f"同轨道: {overlap_result['same_track_overlaps']}, 跨轨道: {overlap_result['cross_track_overlaps']}"
-                                        print(f"检测到全局重叠: 同轨道{overlap_result['same_track_overlaps']}个, 跨轨道{overlap_result['cross_track_overlaps']}个")
-                                        
-                                        # 重叠处理不受跳过匹配文件影响
-                                        if fix_overlap:
-                                            print("\n===== 处理全局多轨道重叠音符（跳过匹配文件时仍处理） =====")
-                                            all_notes = overlap_result.get('all_notes', [])
-                                            if all_notes:
-                                                note_positions = self.fix_multitrack_overlapping_notes(
-                                                    all_notes, fix_cross_track=True
-                                                )
-                                                fix_overlap_status = "已处理(全局模式)"
-                                                print("全局多轨道重叠音符处理完成")
-                                                # 跳过匹配但处理重叠时需要保存文件
-                                                needs_overlap_file_save = True
-                                            else:
-                                                fix_overlap_status = "处理失败"
-                                        else:
-                                            fix_overlap_status = "未处理"
-                                    else:
-                                        overlap_status = "无重叠"
-                                        overlap_details = ""
-                                        fix_overlap_status = "无需处理"
-                                        print("未检测到全局重叠")
-                                    
-                                    # 使用多轨道收集的音符位置
-                                    if 'all_notes' in overlap_result and overlap_result['all_notes']:
-                                        note_positions = overlap_result['all_notes']
-                                else:
-                                    # 多轨道MIDI文件，但用户未启用跨轨道处理，使用分轨道模式
-                                    print("多轨道MIDI文件，使用分轨道模式（处理轨道内重叠）")
-                                    overlap_result = self.detect_multitrack_overlaps(input_file)
-                                    
-                                    if overlap_result['has_overlap']:
-                                        same_track_overlaps = overlap_result['same_track_overlaps']
-                                        cross_track_overlaps = overlap_result['cross_track_overlaps']
-                                        
-                                        if same_track_overlaps > 0:
-                                            overlap_status = f"轨道内重叠 ({same_track_overlaps} 处)"
-                                            if cross_track_overlaps > 0:
-                                                overlap_details = f"轨道内: {same_track_overlaps}, 跨轨道: {cross_track_overlaps}(正常，未处理)"
-                                            else:
-                                                overlap_details = f"轨道内: {same_track_overlaps}"
-                                            print(f"检测到轨道内重叠: {same_track_overlaps}个, 跨轨道重叠: {cross_track_overlaps}个（正常，不处理）")
-                                            
-                                            # 重叠处理不受跳过匹配文件影响
-                                            if fix_overlap:
-                                                print("\n===== 处理轨道内重叠音符（跳过匹配文件时仍处理） =====")
-                                                all_notes = overlap_result.get('all_notes', [])
-                                                if all_notes:
-                                                    note_positions = self.fix_multitrack_overlapping_notes(
-                                                        all_notes, fix_cross_track=False
-                                                    )
-                                                    fix_overlap_status = "已处理(轨道内)"
-                                                    print("轨道内重叠音符处理完成")
-                                                    # 跳过匹配但处理重叠时需要保存文件
-                                                    needs_overlap_file_save = True
-                                                else:
-                                                    fix_overlap_status = "处理失败"
-                                            else:
-                                                fix_overlap_status = "未处理"
-                                        else:
-                                            overlap_status = f"跨轨道重叠 ({cross_track_overlaps} 处, 正常)"
-                                            overlap_details = f"跨轨道: {cross_track_overlaps}(正常，未处理)"
-                                            print(f"只检测到跨轨道重叠: {cross_track_overlaps}个（正常，不处理）")
-                                            fix_overlap_status = "无需处理"  # 只有跨轨道重叠时无需处理
-                                    else:
-                                        overlap_status = "无重叠"
-                                        overlap_details = ""
-                                        fix_overlap_status = "无需处理"
-                                        print("未检测到任何重叠")
-                                    
-                                    # 使用多轨道收集的音符位置
-                                    if 'all_notes' in overlap_result and overlap_result['all_notes']:
-                                        note_positions = overlap_result['all_notes']
-                            else:
-                                # 单轨道MIDI文件，使用传统单轨道重叠检测和处理
-                                print("检测到单轨道MIDI文件，使用传统模式")
-                                overlap_result = self.detect_midi_overlaps(input_file)
-                                if overlap_result['has_overlap']:
-                                    overlap_status = f"存在重叠 ({len(overlap_result['overlaps'])} 处)"
-                                    overlap_details = "\n".join(overlap_result['overlaps'])
-                                    print(f"检测到重叠: {overlap_result['overlaps']}")
-                                    
-                                    # 重叠处理不受跳过匹配文件影响
-                                    if fix_overlap:
-                                        print("\n===== 处理单轨道重叠音符（跳过匹配文件时仍处理） =====")
-                                        note_positions = self.fix_overlapping_notes(note_positions)
-                                        fix_overlap_status = "已处理"
-                                        print("单轨道重叠音符处理完成")
-                                        # 跳过匹配但处理重叠时需要保存文件
-                                        needs_overlap_file_save = True
-                                    else:
-                                        fix_overlap_status = "未处理"
-                                else:
-                                    overlap_status = "无重叠"
-                                    overlap_details = ""
-                                    fix_overlap_status = "无需处理"
-                                    print("未检测到重叠")
+                        # 检测音符重叠（即使文件不需要处理，也要检测重叠；重叠处理不受跳过匹配文件影响）
+                        (overlap_status, overlap_details, fix_overlap_status,
+                         note_positions, needs_overlap_file_save) = self._run_overlap_analysis(
+                            midi, note_positions, check_overlap, fix_overlap, multitrack_overlap, scan
+                        )
                         
                         # 准备输出路径和文件保存逻辑
-                        filename = os.path.basename(input_file)
-                        output_path = os.path.join(output_dir, filename)
+                        output_path = default_output_path
                         
                         # 如果重叠处理需要保存文件，则创建新文件
-                        if 'needs_overlap_file_save' in locals() and needs_overlap_file_save:
-                            print("\n===== 创建重叠处理后的MIDI文件 =====")
+                        if needs_overlap_file_save:
+                            self._log("\n===== 创建重叠处理后的MIDI文件 =====")
                             new_midi = self._create_new_midi_with_exact_timing(
                                 midi, note_positions, target_bpm, remove_cc, set_velocity, False  # keep_original_tempo=False保持原始速度
                             )
-                            new_midi.save(output_path)
-                            print(f"已保存重叠处理后的文件: {output_path}")
+                            self._save_midi_fast(new_midi, output_path)
+                            self._log(f"已保存重叠处理后的文件: {output_path}")
                             status = "已处理（重叠）"
                         else:
                             # 仅检测或无需处理时不创建文件
@@ -297,180 +362,42 @@ class MidiProcessor:
                             output_path = ""  # 无输出文件
                         
                         # 返回处理结果信息
-                        tempo_info = []
-                        for idx, (time_ticks, tempo, time_seconds, measure_beat) in enumerate(self.detailed_tempos):
-                            tempo_info.append({
-                                "id": idx + 1,
-                                "time_ticks": time_ticks,
-                                "time_seconds": time_seconds,
-                                "measure_beat": measure_beat,
-                                "tempo": tempo,
-                                "bpm": self._tempo_to_bpm(tempo)
-                            })
-                        
-                        # 设置正确的状态文本
-                        # 音符力度状态：如果选中了统一音符力度，且力度不一致，则为"未处理"（表示需要处理但未处理）
-                        if set_velocity:
-                            if all_notes_match_velocity:
-                                velocity_status = "无需处理"  # 音符力度已经一致
-                            else:
-                                velocity_status = "未处理"  # 需要处理但因为跳过匹配文件而未处理
-                        else:
-                            velocity_status = "未处理"  # 未选择统一力度
+                        tempo_info = self._build_tempo_info()
                         
-                        # 控制信息状态：根据是否有控制信息决定
-                        if remove_cc:
-                            if has_cc_messages:
-                                cc_status = "未处理"  # 有控制信息，但因为跳过匹配文件而未处理
-                            else:
-                                cc_status = "无需处理"  # 没有控制信息需要移除
-                        else:
-                            cc_status = "未处理"  # 未选择移除控制信息
+                        # 跳过匹配文件时，需要处理但未处理的项目显示为"未处理"
+                        cc_status, velocity_status = self._compute_statuses(
+                            remove_cc, has_cc_messages, set_velocity, all_notes_match_velocity, skipped=True
+                        )
                         
-                        return {
-                            "filename": filename,
-                            "original_bpm": self._tempo_to_bpm(self.original_tempo) if self.original_tempo else "未知",
-                            "target_bpm": target_bpm,
-                            "velocity_modified": set_velocity,
-                            "velocity_status": velocity_status,
-                            "cc_removed": remove_cc,
-                            "cc_status": cc_status,
-                            "overlap_status": overlap_status,
-                            "overlap_details": overlap_details,
-                            "fix_overlap_status": fix_overlap_status,
-                            "tempo_changes": tempo_info,
-                            "note_count": len(note_positions),
-                            "status": status,
-                            "path": output_path,
-                            "is_multi_tempo": has_multiple_tempos
-                        }
+                        return ProcessResult(
+                            filename=filename,
+                            original_bpm=result_original_bpm,
+                            target_bpm=target_bpm,
+                            velocity_modified=set_velocity,
+                            velocity_status=velocity_status,
+                            cc_removed=remove_cc,
+                            cc_status=cc_status,
+                            overlap_status=overlap_status,
+                            overlap_details=overlap_details,
+                            fix_overlap_status=fix_overlap_status,
+                            tempo_changes=tempo_info,
+                            note_count=len(note_positions),
+                            status=status,
+                            path=output_path,
+                            is_multi_tempo=has_multiple_tempos
+                        )
                     else:
-                        print(f"BPM匹配但需要移除控制信息，继续处理: {input_file}")
+                        self._log(f"BPM匹配但需要移除控制信息，继续处理: {input_file}")
             
             # 收集所有原始音符的绝对秒位置
-            print("\n===== 收集原始音符位置 =====")
-            note_positions = self._collect_note_positions(midi)
+            self._log("\n===== 收集原始音符位置 =====")
+            note_positions = self._collect_note_positions(midi, scan)
             
             # 检测音符重叠
-            fix_overlap_status = "未处理"
-            if check_overlap:
-                print("\n===== 检测音符重叠 =====")
-                
-                # 检测是否为多轨道MIDI文件
-                track_count = len(midi.tracks)
-                has_multiple_note_tracks = sum(1 for track in midi.tracks if any(msg.type in ['note_on', 'note_off'] for msg in track)) > 1
-                
-                if has_multiple_note_tracks:
-                    print(f"检测到多轨道MIDI文件（{track_count}个轨道）")
-                    
-                    if multitrack_overlap:
-                        # 用户明确启用了跨轨道处理，使用全局模式
-                        print("用户启用了跨轨道重叠处理，使用全局模式")
-                        overlap_result = self.detect_multitrack_overlaps(input_file)
-                        if overlap_result['has_overlap']:
-                            overlap_status = f"多轨全局重叠 ({overlap_result['total_overlaps']} 处)"
-                            overlap_details = f"同轨道: {overlap_result['same_track_overlaps']}, 跨轨道: {overlap_result['cross_track_overlaps']}"
-                            print(f"检测到全局重叠: 同轨道{overlap_result['same_track_overlaps']}个, 跨轨道{overlap_result['cross_track_overlaps']}个")
-                            
-                            # 处理全局重叠音符
-                            if fix_overlap:
-                                print("\n===== 处理全局多轨道重叠音符 =====")
-                                all_notes = overlap_result.get('all_notes', [])
-                                if all_notes:
-                                    note_positions = self.fix_multitrack_overlapping_notes(
-                                        all_notes, fix_cross_track=True
-                                    )
-                                    fix_overlap_status = "已处理(全局模式)"
-                                    print("全局多轨道重叠音符处理完成")
-                                else:
-                                    fix_overlap_status = "处理失败"
-                            else:
-                                fix_overlap_status = "未处理"
-                        else:
-                            overlap_status = "无重叠"
-                            overlap_details = ""
-                            fix_overlap_status = "无需处理"
-                            print("未检测到全局重叠")
-                            
-                            # 使用多轨道收集的音符位置
-                            if 'all_notes' in overlap_result and overlap_result['all_notes']:
-                                note_positions = overlap_result['all_notes']
-                    else:
-                        # 多轨道MIDI文件，但用户未启用跨轨道处理，使用分轨道模式
-                        print("多轨道MIDI文件，使用分轨道模式（仅处理各轨道内部重叠）")
-                        overlap_result = self.detect_multitrack_overlaps(input_file)
-                        
-                        if overlap_result['has_overlap']:
-                            same_track_overlaps = overlap_result['same_track_overlaps']
-                            cross_track_overlaps = overlap_result['cross_track_overlaps']
-                            
-                            if same_track_overlaps > 0:
-                                overlap_status = f"轨道内重叠 ({same_track_overlaps} 处)"
-                                if cross_track_overlaps > 0:
-                                    overlap_details = f"轨道内: {same_track_overlaps}, 跨轨道: {cross_track_overlaps}(正常，未处理)"
-                                else:
-                                    overlap_details = f"轨道内: {same_track_overlaps}"
-                                print(f"检测到轨道内重叠: {same_track_overlaps}个, 跨轨道重叠: {cross_track_overlaps}个（正常，不处理）")
-                            else:
-                                overlap_status = f"跨轨道重叠 ({cross_track_overlaps} 处, 正常)"
-                                overlap_details = f"跨轨道: {cross_track_overlaps}(正常，未处理)"
-                                print(f"只检测到跨轨道重叠: {cross_track_overlaps}个（正常，不处理）")
-                            
-                            # 处理轨道内重叠音符（仅处理同轨道内的重叠）
-                            if fix_overlap and same_track_overlaps > 0:
-                                print("\n===== 处理轨道内重叠音符 =====")
-                                all_notes = overlap_result.get('all_notes', [])
-                                if all_notes:
-                                    note_positions = self.fix_multitrack_overlapping_notes(
-                                        all_notes, fix_cross_track=False  # 仅处理轨道内重叠
-                                    )
-                                    fix_overlap_status = "已处理(轨道内)"
-                                    print("轨道内重叠音符处理完成")
-                                else:
-                                    fix_overlap_status = "处理失败"
-                            elif fix_overlap and same_track_overlaps == 0:
-                                fix_overlap_status = "无需处理(无轨道内重叠)"
-                                # 使用多轨道收集的音符位置
-                                if 'all_notes' in overlap_result and overlap_result['all_notes']:
-                                    note_positions = overlap_result['all_notes']
-                            else:
-                                fix_overlap_status = "未处理"
-                                # 使用多轨道收集的音符位置
-                                if 'all_notes' in overlap_result and overlap_result['all_notes']:
-                                    note_positions = overlap_result['all_notes']
-                        else:
-                            overlap_status = "无重叠"
-                            overlap_details = ""
-                            fix_overlap_status = "无需处理"
-                            print("未检测到任何重叠")
-                            
-                            # 使用多轨道收集的音符位置
-                            if 'all_notes' in overlap_result and overlap_result['all_notes']:
-                                note_positions = overlap_result['all_notes']
-                else:
-                    # 单轨道MIDI文件，使用传统单轨道重叠检测
-                    print("检测到单轨道MIDI文件，使用传统模式")
-                    overlap_result = self.detect_midi_overlaps(input_file)
-                    if overlap_result['has_overlap']:
-                        overlap_status = f"存在重叠 ({len(overlap_result['overlaps'])} 处)"
-                        overlap_details = "\n".join(overlap_result['overlaps'])
-                        print(f"检测到重叠: {overlap_result['overlaps']}")
-                        
-                        # 处理重叠音符
-                        if fix_overlap:
-                            print("\n===== 处理重叠音符 =====")
-                            note_positions = self.fix_overlapping_notes(note_positions)
-                            fix_overlap_status = "已处理"
-                            print("重叠音符处理完成")
-                        else:
-                            fix_overlap_status = "未处理"
-                    else:
-                        overlap_status = "无重叠"
-                        overlap_details = ""
-                        fix_overlap_status = "无需处理"
-                        print("未检测到重叠")
-            else:
-                overlap_details = ""
+            (overlap_status, overlap_details, fix_overlap_status,
+             note_positions, _) = self._run_overlap_analysis(
+                midi, note_positions, check_overlap, fix_overlap, multitrack_overlap, scan
+            )
             
             # 判断是否需要创建新文件
             # 仅当以下情况之一成立时才创建新文件：
@@ -487,27 +414,13 @@ class MidiProcessor:
             else:
                 # 单速度MIDI：只有当用户勾选了速度转换且速度不匹配时才需要转换
                 needs_bpm_conversion = (keep_original_tempo and 
-                                      abs(self._tempo_to_bpm(self.original_tempo or 500000) - target_bpm) >= 0.1)
+                                      abs(original_bpm - target_bpm) >= 0.1)
             
             # 检查是否需要移除控制消息
-            needs_cc_removal = remove_cc and any(
-                msg.type in ['control_change', 'pitchwheel', 'program_change', 
-                           'aftertouch', 'polytouch', 'sysex']
-                for track in midi.tracks for msg in track
-            )
+            needs_cc_removal = remove_cc and has_cc_messages
             
             # 检查是否需要设置音符力度
-            needs_velocity_change = False
-            if set_velocity:
-                target_velocity = int(128 * velocity_percent / 100)
-                for track in midi.tracks:
-                    for msg in track:
-                        if msg.type == 'note_on' and msg.velocity > 0:
-                            if abs(msg.velocity - target_velocity) > 3:
-                                needs_velocity_change = True
-                                break
-                    if needs_velocity_change:
-                        break
+            needs_velocity_change = set_velocity and not all_notes_match_velocity
             
             # 检查是否需要处理重叠音符
             needs_overlap_processing = fix_overlap and ("重叠" in overlap_status and overlap_status != "无重叠")
@@ -524,17 +437,16 @@ class MidiProcessor:
             
             if needs_file_output:
                 # 创建新的MIDI文件，保持音符的精确时间位置
-                print("\n===== 创建新MIDI文件 =====")
+                self._log("\n===== 创建新MIDI文件 =====")
                 
                 # 如果是强制处理模式，但实际上不需要任何处理，则直接复制文件
                 if force_processing and not (needs_bpm_conversion or needs_cc_removal or 
                                            needs_velocity_change or needs_overlap_processing):
                     # 强制处理模式：复制原文件
                     import shutil
-                    filename = os.path.basename(input_file)
-                    output_path = os.path.join(output_dir, filename)
+                    output_path = default_output_path
                     shutil.copy2(input_file, output_path)
-                    print(f"强制处理模式：复制原文件到: {output_path}")
+                    self._log(f"强制处理模式：复制原文件到: {output_path}")
                     status = "已处理（强制）"
                 else:
                     # 正常处理模式
@@ -543,77 +455,258 @@ class MidiProcessor:
                     )
                     
                     # 准备输出路径
-                    filename = os.path.basename(input_file)
-                    output_path = os.path.join(output_dir, filename)
+                    output_path = default_output_path
                     
                     # 保存处理后的MIDI文件
-                    new_midi.save(output_path)
-                    print(f"已保存处理后的文件: {output_path}")
+                    self._save_midi_fast(new_midi, output_path)
+                    self._log(f"已保存处理后的文件: {output_path}")
                     status = "成功"
             else:
                 # 仅检测模式，不输出文件
                 if check_overlap and not fix_overlap:
-                    print("\n===== 仅检测模式，不输出文件 =====")
+                    self._log("\n===== 仅检测模式，不输出文件 =====")
                     status = "仅检测"
                 else:
-                    print("\n===== 无需处理，不输出文件 =====")
+                    self._log("\n===== 无需处理，不输出文件 =====")
                     status = "无需处理"
                 
-                # 使用原始文件路径作为参考
-                filename = os.path.basename(input_file)
                 output_path = ""  # 无输出文件
             
             # 返回处理结果信息
-            tempo_info = []
-            for idx, (time_ticks, tempo, time_seconds, measure_beat) in enumerate(self.detailed_tempos):
-                tempo_info.append({
-                    "id": idx + 1,
-                    "time_ticks": time_ticks,
-                    "time_seconds": time_seconds,
-                    "measure_beat": measure_beat,
-                    "tempo": tempo,
-                    "bpm": self._tempo_to_bpm(tempo)
-                })
-            
-            return {
-                "filename": filename,
-                "original_bpm": self._tempo_to_bpm(self.original_tempo) if self.original_tempo else "未知",
-                "target_bpm": target_bpm,
-                "velocity_modified": set_velocity,
-                "velocity_status": velocity_status,
-                "cc_removed": remove_cc,
-                "cc_status": cc_status,
-                "overlap_status": overlap_status,
-                "overlap_details": overlap_details,
-                "fix_overlap_status": fix_overlap_status,
-                "tempo_changes": tempo_info,
-                "note_count": len(note_positions),
-                "status": status,
-                "path": output_path,
-                "is_multi_tempo": has_multiple_tempos
-            }
+            tempo_info = self._build_tempo_info()
+            
+            return ProcessResult(
+                filename=filename,
+                original_bpm=result_original_bpm,
+                target_bpm=target_bpm,
+                velocity_modified=set_velocity,
+                velocity_status=velocity_status,
+                cc_removed=remove_cc,
+                cc_status=cc_status,
+                overlap_status=overlap_status,
+                overlap_details=overlap_details,
+                fix_overlap_status=fix_overlap_status,
+                tempo_changes=tempo_info,
+                note_count=len(note_positions),
+                status=status,
+                path=output_path,
+                is_multi_tempo=has_multiple_tempos
+            )
             
         except Exception as e:
             import traceback
             print(f"处理错误: {str(e)}")
             print(traceback.format_exc())
-            return {
-                "filename": os.path.basename(input_file),
-                "original_bpm": "未知",
-                "target_bpm": target_bpm,
-                "velocity_modified": set_velocity,
-                "velocity_status": "处理失败",
-                "cc_removed": remove_cc,
-                "cc_status": "处理失败",
-                "overlap_status": "检测失败",
-                "overlap_details": "",
-                "fix_overlap_status": "处理失败",
-                "tempo_changes": [],
-                "note_count": 0,
-                "status": f"错误: {str(e)}",
-                "path": "",
-                "is_multi_tempo": False
+            return ProcessResult(
+                filename=filename,
+                original_bpm="未知",
+                target_bpm=target_bpm,
+                velocity_modified=set_velocity,
+                velocity_status="处理失败",
+                cc_removed=remove_cc,
+                cc_status="处理失败",
+                overlap_status="检测失败",
+                overlap_details="",
+                fix_overlap_status="处理失败",
+                tempo_changes=[],
+                note_count=0,
+                status=f"错误: {str(e)}",
+                path="",
+                is_multi_tempo=False
+            )
+    
+    @staticmethod
+    def _compute_statuses(remove_cc: bool, has_cc: bool, set_velocity: bool,
+                          all_match_velocity: bool, skipped: bool) -> Tuple[str, str]:
+        """
+        计算BPM匹配时控制消息和音符力度的状态文本
+        
+        Args:
+            remove_cc: 是否勾选了删除控制消息
+            has_cc: 文件是否包含控制消息
+            set_velocity: 是否勾选了统一音符力度
+            all_match_velocity: 音符力度是否已与目标力度一致
+            skipped: 文件是否因"跳过匹配文件"而未输出（需要处理的项目显示为"未处理"）
+            
+        Returns:
+            (cc_status, velocity_status)
+        """
+        done = "未处理" if skipped else "已处理"
+        
+        if not remove_cc:
+            cc_status = "未处理"
+        elif not has_cc:
+            cc_status = "无需处理"
+        else:
+            cc_status = done
+        
+        if not set_velocity:
+            velocity_status = "未处理"
+        elif all_match_velocity:
+            velocity_status = "无需处理"
+        else:
+            velocity_status = done
+        
+        return cc_status, velocity_status
+    
+    def _build_tempo_info(self) -> List[Dict[str, Any]]:
+        """将 self.detailed_tempos 转换为结果中使用的速度信息列表"""
+        bpms = self._tempos_to_bpms([entry[1] for entry in self.detailed_tempos])
+        return [
+            {
+                "id": idx,
+                "time_ticks": time_ticks,
+                "time_seconds": time_seconds,
+                "measure_beat": measure_beat,
+                "tempo": tempo,
+                "bpm": bpm
             }
+            for idx, ((time_ticks, tempo, time_seconds, measure_beat), bpm)
+            in enumerate(zip(self.detailed_tempos, bpms), 1)
+        ]
+    
+    def _run_overlap_analysis(self,
+                              midi: mido.MidiFile,
+                              note_positions: List[Note],
+                              check_overlap: bool,
+                              fix_overlap: bool,
+                              multitrack_overlap: bool,
+                              scan: Optional[ScanResult] = None) -> Tuple[str, str, str, List[Note], bool]:
+        """
+        检测（并按需处理）音符重叠，process_file 的各个分支共用
+        
+        Args:
+            midi: 已加载的MIDI文件
+            note_positions: 已收集的音符位置列表
+            check_overlap: 是否检测音符重叠
+            fix_overlap: 是否处理重叠音符
+            multitrack_overlap: 是否处理跨轨道重叠（True=全局处理，False=分轨道处理）
+            scan: 已有的扫描结果，为None时重新扫描
+            
+        Returns:
+            (overlap_status, overlap_details, fix_overlap_status, note_positions, overlap_fixed)
+            其中 overlap_fixed 表示音符列表是否已经过重叠处理
+        """
+        overlap_status = "未检测"
+        overlap_details = ""
+        fix_overlap_status = "未处理"
+        overlap_fixed = False
+        
+        if not check_overlap:
+            return overlap_status, overlap_details, fix_overlap_status, note_positions, overlap_fixed
+        
+        self._log("\n===== 检测音符重叠 =====")
+        
+        # 检测是否为多轨道MIDI文件
+        track_count = len(midi.tracks)
+        if scan is None:
+            scan = self._scan_tracks(midi)
+        has_multiple_note_tracks = scan.note_track_count > 1
+        
+        if has_multiple_note_tracks:
+            self._log(f"检测到多轨道MIDI文件（{track_count}个轨道）")
+            
+            if multitrack_overlap:
+                # 用户明确启用了跨轨道处理，使用全局模式
+                self._log("用户启用了跨轨道重叠处理，使用全局模式")
+                overlap_result = self.detect_multitrack_overlaps(midi, details=False)
+                if overlap_result['has_overlap']:
+                    overlap_status = f"多轨全局重叠 ({overlap_result['total_overlaps']} 处)"
+                    overlap_details = f"同轨道: {overlap_result['same_track_overlaps']}, 跨轨道: {overlap_result['cross_track_overlaps']}"
+                    self._log(f"检测到全局重叠: 同轨道{overlap_result['same_track_overlaps']}个, 跨轨道{overlap_result['cross_track_overlaps']}个")
+                    
+                    # 处理全局重叠音符
+                    if fix_overlap:
+                        self._log("\n===== 处理全局多轨道重叠音符 =====")
+                        all_notes = overlap_result.get('all_notes', [])
+                        if all_notes:
+                            note_positions = self.fix_multitrack_overlapping_notes(
+                                all_notes, fix_cross_track=True
+                            )
+                            fix_overlap_status = "已处理(全局模式)"
+                            overlap_fixed = True
+                            self._log("全局多轨道重叠音符处理完成")
+                        else:
+                            fix_overlap_status = "处理失败"
+                    else:
+                        fix_overlap_status = "未处理"
+                else:
+                    overlap_status = "无重叠"
+                    overlap_details = ""
+                    fix_overlap_status = "无需处理"
+                    self._log("未检测到全局重叠")
+            else:
+                # 多轨道MIDI文件，但用户未启用跨轨道处理，使用分轨道模式
+                self._log("多轨道MIDI文件，使用分轨道模式（仅处理各轨道内部重叠）")
+                overlap_result = self.detect_multitrack_overlaps(midi, details=False)
+                
+                if overlap_result['has_overlap']:
+                    same_track_overlaps = overlap_result['same_track_overlaps']
+                    cross_track_overlaps = overlap_result['cross_track_overlaps']
+                    
+                    if same_track_overlaps > 0:
+                        overlap_status = f"轨道内重叠 ({same_track_overlaps} 处)"
+                        if cross_track_overlaps > 0:
+                            overlap_details = f"轨道内: {same_track_overlaps}, 跨轨道: {cross_track_overlaps}(正常，未处理)"
+                        else:
+                            overlap_details = f"轨道内: {same_track_overlaps}"
+                        self._log(f"检测到轨道内重叠: {same_track_overlaps}个, 跨轨道重叠: {cross_track_overlaps}个（正常，不处理）")
+                    else:
+                        overlap_status = f"跨轨道重叠 ({cross_track_overlaps} 处, 正常)"
+                        overlap_details = f"跨轨道: {cross_track_overlaps}(正常，未处理)"
+                        self._log(f"只检测到跨轨道重叠: {cross_track_overlaps}个（正常，不处理）")
+                    
+                    # 处理轨道内重叠音符（仅处理同轨道内的重叠）
+                    if fix_overlap and same_track_overlaps > 0:
+                        self._log("\n===== 处理轨道内重叠音符 =====")
+                        all_notes = overlap_result.get('all_notes', [])
+                        if all_notes:
+                            note_positions = self.fix_multitrack_overlapping_notes(
+                                all_notes, fix_cross_track=False  # 仅处理轨道内重叠
+                            )
+                            fix_overlap_status = "已处理(轨道内)"
+                            overlap_fixed = True
+                            self._log("轨道内重叠音符处理完成")
+                        else:
+                            fix_overlap_status = "处理失败"
+                    elif fix_overlap and same_track_overlaps == 0:
+                        fix_overlap_status = "无需处理(无轨道内重叠)"
+                    else:
+                        fix_overlap_status = "未处理"
+                else:
+                    overlap_status = "无重叠"
+                    overlap_details = ""
+                    fix_overlap_status = "无需处理"
+                    self._log("未检测到任何重叠")
+            
+            # 未经过重叠处理时，使用多轨道收集的音符位置
+            if not overlap_fixed and overlap_result.get('all_notes'):
+                note_positions = overlap_result['all_notes']
+        else:
+            # 单轨道MIDI文件，使用传统单轨道重叠检测
+            self._log("检测到单轨道MIDI文件，使用传统模式")
+            overlap_result = self.detect_midi_overlaps(midi)
+            if overlap_result['has_overlap']:
+                overlap_status = f"存在重叠 ({len(overlap_result['overlaps'])} 处)"
+                overlap_details = "\n".join(overlap_result['overlaps'])
+                self._log(f"检测到重叠: {overlap_result['overlaps']}")
+                
+                # 处理重叠音符
+                if fix_overlap:
+                    self._log("\n===== 处理重叠音符 =====")
+                    note_positions = self.fix_overlapping_notes(note_positions)
+                    fix_overlap_status = "已处理"
+                    overlap_fixed = True
+                    self._log("重叠音符处理完成")
+                else:
+                    fix_overlap_status = "未处理"
+            else:
+                overlap_status = "无重叠"
+                overlap_details = ""
+                fix_overlap_status = "无需处理"
+                self._log("未检测到重叠")
+        
+        return overlap_status, overlap_details, fix_overlap_status, note_positions, overlap_fixed
     
     def _create_timestamp_midi(self, ticks_per_beat: int) -> mido.MidiFile:
         """创建一个等间隔时间戳MIDI文件，用于测试和对比"""
@@ -653,95 +746,135 @@ class MidiProcessor:
         
         return midi
     
-    def _collect_note_positions(self, midi: mido.MidiFile) -> List[Dict[str, Any]]:
-        """收集所有音符的绝对时间位置 - 修复版本"""
-        note_positions = []
+    def _scan_tracks(self, midi: mido.MidiFile, plan: Optional[ProcessingPlan] = None) -> ScanResult:
+        """
+        一次遍历所有轨道的所有消息，同时收集速度变化、控制消息、力度范围和音符配对
+        
+        Args:
+            midi: MIDI文件
+            plan: 处理计划，为None时执行全部检查；计划中不需要的检查会被跳过（结果保持默认值）
+            
+        Returns:
+            ScanResult 扫描结果
+        """
+        scan = ScanResult()
+        cc_types = _CC_MSG_TYPES
+        note_types = _NOTE_MSG_TYPES
+        tempo_events = scan.tempo_events
+        min_velocity = 128
+        max_velocity = -1
+        first_note = None
+        has_cc = False
+        # 找到第一个控制消息后不再需要检查
+        check_cc = plan is None or plan.need_cc_scan
+        check_velocity = plan is None or plan.need_vel_scan
         
         for track_idx, track in enumerate(midi.tracks):
-            absolute_time_ticks = 0
-            # 使用栈来正确处理重叠的相同音符
-            active_notes = {}  # {(note, channel): [stack of start_info]}
+            absolute_ticks = 0
+            # 使用队列来正确处理重叠的相同音符，按 (channel << 7) | note 直接索引的固定大小表，
+            # 不需要为每个音符事件创建元组key和计算哈希 [deque([(start_tick, velocity), ...]) 或 None]
+            active_notes = [None] * _NOTE_SLOT_COUNT
+            note_pairs = []
+            has_note_msgs = False
             
-            for msg_idx, msg in enumerate(track):
-                absolute_time_ticks += msg.time
+            for msg in track:
+                absolute_ticks += msg.time
+                msg_type = msg.type
                 
-                if msg.type == 'note_on' and msg.velocity > 0:
-                    # 记录音符开始
-                    note_key = (msg.note, msg.channel)
-                    if note_key not in active_notes:
-                        active_notes[note_key] = []
+                if msg_type in note_types:
+                    has_note_msgs = True
+                    # 每个属性只读取一次（mido消息的属性访问开销较大）
+                    note = msg.note
+                    channel = msg.channel
+                    velocity = msg.velocity
                     
-                    # 使用栈结构处理重叠的相同音符
-                    active_notes[note_key].append({
-                        'start_tick': absolute_time_ticks,
-                        'velocity': msg.velocity
-                    })
-                
-                elif (msg.type == 'note_off' or 
-                      (msg.type == 'note_on' and msg.velocity == 0)):
-                    # 找到音符结束
-                    note_key = (msg.note, msg.channel)
-                    if note_key in active_notes and active_notes[note_key]:
-                        # 使用FIFO（先进先出）处理重叠音符 - 修复配对错误
-                        start_info = active_notes[note_key].pop(0)
-                        start_tick = start_info['start_tick']
-                        velocity = start_info['velocity']
-                        duration_ticks = absolute_time_ticks - start_tick
-                        
-                        # 使用高精度计算秒位置
-                        start_seconds = self._calculate_absolute_time_with_tempo_changes_precise(
-                            start_tick, self.tempo_changes, midi.ticks_per_beat
-                        )
-                        end_seconds = self._calculate_absolute_time_with_tempo_changes_precise(
-                            absolute_time_ticks, self.tempo_changes, midi.ticks_per_beat
-                        )
-                        duration_seconds = end_seconds - start_seconds
+                    if velocity and msg_type == 'note_on':
+                        if check_velocity:
+                            if velocity < min_velocity:
+                                min_velocity = velocity
+                            if velocity > max_velocity:
+                                max_velocity = velocity
+                        if first_note is None or absolute_ticks < first_note[0]:
+                            first_note = (absolute_ticks, track_idx)
                         
-                        # 记录音符信息
-                        note_positions.append({
-                            'track': track_idx,
-                            'note': msg.note,
-                            'channel': msg.channel,
-                            'velocity': velocity,
-                            'start_tick': start_tick,
-                            'end_tick': absolute_time_ticks,
-                            'start_seconds': start_seconds,
-                            'end_seconds': end_seconds,
-                            'duration_ticks': duration_ticks,
-                            'duration_seconds': duration_seconds
-                        })
-                        
-                        # 如果这个音符的栈空了，删除key
-                        if not active_notes[note_key]:
-                            del active_notes[note_key]
+                        slot = (channel << 7) | note
+                        stack = active_notes[slot]
+                        if stack is None:
+                            stack = active_notes[slot] = deque()
+                        stack.append((absolute_ticks, velocity))
+                    else:
+                        # note_off 或力度为0的note_on，使用FIFO（先进先出）配对
+                        stack = active_notes[(channel << 7) | note]
+                        if stack:
+                            start_tick, start_velocity = stack.popleft()
+                            note_pairs.append((note, channel, start_velocity, start_tick, absolute_ticks))
+                
+                elif msg_type == 'set_tempo':
+                    tempo_events.append((absolute_ticks, msg.tempo, track_idx))
+                
+                elif check_cc and msg_type in cc_types:
+                    has_cc = True
+                    check_cc = False
+            
+            scan.note_pairs_by_track.append(note_pairs)
+            if has_note_msgs:
+                scan.note_track_count += 1
+            scan.unmatched_notes += sum(len(stack) for stack in active_notes if stack)
+            scan.track_lengths.append(len(track))
+        
+        scan.has_cc = has_cc
+        scan.has_notes = first_note is not None
+        if scan.has_notes and max_velocity >= 0:
+            scan.min_velocity = min_velocity
+            scan.max_velocity = max_velocity
+        scan.first_note = first_note
+        return scan
+    
+    def _collect_note_positions(self, midi: mido.MidiFile, scan: Optional[ScanResult] = None) -> List[Note]:
+        """收集所有音符的绝对时间位置 - 修复版本"""
+        if scan is None:
+            scan = self._scan_tracks(midi)
+        
+        note_positions = []
+        
+        for track_idx, note_pairs in enumerate(scan.note_pairs_by_track):
+            # 整个轨道的开始/结束位置一次性换算为秒
+            start_seconds = self._ticks_to_absolute_seconds_batch([pair[3] for pair in note_pairs])
+            end_seconds = self._ticks_to_absolute_seconds_batch([pair[4] for pair in note_pairs])
+            
+            note_positions.extend(
+                Note(track_idx, note, channel, velocity, start_tick, end_tick, start_sec, end_sec)
+                for (note, channel, velocity, start_tick, end_tick), start_sec, end_sec
+                in zip(note_pairs, start_seconds, end_seconds)
+            )
         
         # 检查是否有未配对的note_on事件
-        unmatched_count = sum(len(stack) for stack in active_notes.values())
+        unmatched_count = scan.unmatched_notes
         if unmatched_count > 0:
-            print(f"警告: 有 {unmatched_count} 个note_on事件没有找到对应的note_off事件")
+            self._log(f"警告: 有 {unmatched_count} 个note_on事件没有找到对应的note_off事件")
         
         # 按开始时间排序
-        note_positions.sort(key=lambda x: x['start_seconds'])
+        note_positions.sort(key=_note_start_seconds)
         
         # 打印首个音符信息
         if note_positions:
             first_note = note_positions[0]
-            print(f"首个音符: {first_note['note']} 在轨道 {first_note['track']+1}, "
-                  f"通道 {first_note['channel']+1}, 时间 {first_note['start_seconds']:.6f} 秒, "
-                  f"{first_note['start_tick']} ticks, 持续 {first_note['duration_seconds']:.6f} 秒")
+            self._log(f"首个音符: {first_note.note} 在轨道 {first_note.track+1}, "
+                      f"通道 {first_note.channel+1}, 时间 {first_note.start_seconds:.6f} 秒, "
+                      f"{first_note.start_tick} ticks, 持续 {first_note.duration_seconds:.6f} 秒")
             
             # 如果有多个音符，也打印第二个
             if len(note_positions) > 1:
                 second_note = note_positions[1]
-                print(f"第二个音符: {second_note['note']} 在轨道 {second_note['track']+1}, "
-                      f"通道 {second_note['channel']+1}, 时间 {second_note['start_seconds']:.6f} 秒, "
-                      f"{second_note['start_tick']} ticks, 持续 {second_note['duration_seconds']:.6f} 秒")
+                self._log(f"第二个音符: {second_note.note} 在轨道 {second_note.track+1}, "
+                          f"通道 {second_note.channel+1}, 时间 {second_note.start_seconds:.6f} 秒, "
+                          f"{second_note.start_tick} ticks, 持续 {second_note.duration_seconds:.6f} 秒")
         
         return note_positions
     
     def _create_new_midi_with_exact_timing(self, 
                                         orig_midi: mido.MidiFile, 
-                                        note_positions: List[Dict[str, Any]],
+                                        note_positions: List[Note],
                                         target_bpm: float,
                                         remove_cc: bool,
                                         set_velocity: bool,
@@ -767,14 +900,14 @@ class MidiProcessor:
         # keep_original_tempo现在表示是否启用速度转换（True=启用转换，False=保持原始速度）
         if keep_original_tempo:
             target_tempo = self._bpm_to_tempo(target_bpm)
-            print(f"设置目标速度: {target_bpm:.2f} BPM")
+            self._log(f"设置目标速度: {target_bpm:.2f} BPM")
         else:
             target_tempo = self.original_tempo if self.original_tempo else self._bpm_to_tempo(target_bpm)
-            print(f"保持原始速度: {self._tempo_to_bpm(target_tempo):.2f} BPM")
+            self._log(f"保持原始速度: {self._tempo_to_bpm(target_tempo):.2f} BPM")
         
         # 计算实际力度值 (将百分比正确转换为MIDI力度值，范围1-127)
-        velocity_value = min(127, max(1, int(127 * self.velocity_percent / 100)))
-        print(f"设置音符力度为: {velocity_value} ({self.velocity_percent}%)")
+        velocity_value = self._percent_to_velocity(self.velocity_percent)
+        self._log(f"设置音符力度为: {velocity_value} ({self.velocity_percent}%)")
         
         # 创建新的轨道
         for i in range(len(orig_midi.tracks)):
@@ -785,161 +918,235 @@ class MidiProcessor:
             if i == 0:
                 new_track.append(mido.MetaMessage('set_tempo', tempo=target_tempo, time=0))
         
-        # 先收集每个轨道的所有事件
+        # 先收集每个轨道的所有事件 [(绝对tick, 序号, 消息, 是否为新建消息)]
+        # 序号保证tick相同时保持加入顺序（例如零时长音符的note_on在note_off之前）
+        # 新建的音符消息可直接修改time；来自原文件的消息需要复制，避免修改原MIDI
         track_events = [[] for _ in range(len(orig_midi.tracks))]
+        seq = itertools.count()
+        
+        ticks_per_beat = orig_midi.ticks_per_beat
+        
+        # 整个文件只有一个速度且与目标速度相同时，tick→秒→tick的换算结果就是原tick，直接沿用
+        tick_passthrough = {tempo for _, tempo in self.tempo_changes} == {target_tempo}
         
         for track_idx, track in enumerate(orig_midi.tracks):
+            events = track_events[track_idx]
+            cc_events = []  # 需要按新速度换算位置的控制事件 [(原绝对tick, 序号, 消息)]
             absolute_ticks = 0
             for msg in track:
                 absolute_ticks += msg.time
+                msg_type = msg.type
                 
-                # 跳过音符事件（这些会通过note_positions重新添加）
-                if msg.type in ['note_on', 'note_off']:
-                    continue
-                    
-                # 如果勾选删除CC，跳过控制器、程序改变等控制类事件
-                if remove_cc and msg.type in ['control_change', 'pitchwheel', 'program_change', 
-                                            'aftertouch', 'polytouch', 'sysex']:
-                    continue
-                    
-                # 跳过速度事件（我们已经设置了新的速度）
-                if msg.type == 'set_tempo':
+                # 跳过音符事件（通过note_positions重新添加）、速度事件（已设置新的速度）和标记事件
+                if msg_type in _REBUILD_SKIP_MSG_TYPES:
                     continue
-                    
-                # 跳过标记事件
-                if msg.type in ['marker', 'text', 'cue_marker', 'lyrics']:
-                    continue
-                
-                # 计算事件的绝对秒位置
-                absolute_seconds = self._calculate_absolute_time_with_tempo_changes(
-                    absolute_ticks, self.tempo_changes, orig_midi.ticks_per_beat
-                )
                 
-                # 对于CC控制信息，需要转换时间位置到新的速度
-                if not remove_cc and msg.type in ['control_change', 'pitchwheel', 'program_change', 
-                                                'aftertouch', 'polytouch', 'sysex']:
-                    # 计算新的tick位置
-                    new_ticks = self._seconds_to_ticks_precise(absolute_seconds, target_tempo, orig_midi.ticks_per_beat)
-                    
-                    # 保存控制事件和转换后的时间位置
-                    track_events[track_idx].append({
-                        'msg': msg,
-                        'absolute_ticks': new_ticks,
-                        'absolute_seconds': absolute_seconds
-                    })
+                if msg_type in _CC_MSG_TYPES:
+                    # 如果勾选删除CC，跳过控制器、程序改变等控制类事件
+                    if remove_cc:
+                        continue
+                    if tick_passthrough:
+                        events.append((absolute_ticks, next(seq), msg, False))
+                        continue
+                    # CC控制信息需要按绝对秒位置转换到新的速度（整个轨道统一换算）
+                    cc_events.append((absolute_ticks, next(seq), msg))
                 else:
                     # 对于其他事件，保持原始时间位置
-                    track_events[track_idx].append({
-                        'msg': msg,
-                        'absolute_ticks': absolute_ticks,
-                        'absolute_seconds': absolute_seconds
-                    })
+                    events.append((absolute_ticks, next(seq), msg, False))
+            
+            if cc_events:
+                cc_seconds = self._ticks_to_absolute_seconds_batch([event[0] for event in cc_events])
+                cc_new_ticks = self._seconds_to_ticks_precise_batch(cc_seconds, target_tempo, ticks_per_beat)
+                events.extend((new_ticks, event_seq, msg, False)
+                              for new_ticks, (_, event_seq, msg) in zip(cc_new_ticks, cc_events))
+        
+        # 一次性计算所有音符新的tick位置，使用高精度时间计算
+        new_start_ticks_list = self._seconds_to_ticks_precise_batch(
+            [note.start_seconds for note in note_positions], target_tempo, ticks_per_beat)
+        new_end_ticks_list = self._seconds_to_ticks_precise_batch(
+            [note.end_seconds for note in note_positions], target_tempo, ticks_per_beat)
         
         # 按轨道处理所有音符
-        for note in note_positions:
-            track_idx = note['track']
-            
-            # 计算新的tick位置，使用高精度时间计算
-            new_start_ticks = self._seconds_to_ticks_precise(note['start_seconds'], target_tempo, orig_midi.ticks_per_beat)
-            new_end_ticks = self._seconds_to_ticks_precise(note['end_seconds'], target_tempo, orig_midi.ticks_per_beat)
+        for note, new_start_ticks, new_end_ticks in zip(note_positions, new_start_ticks_list, new_end_ticks_list):
+            track_idx = note.track
             
             # 创建音符开始事件
             note_on = mido.Message('note_on', 
-                                channel=note['channel'],
-                                note=note['note'], 
-                                velocity=velocity_value if set_velocity else note['velocity'],
+                                channel=note.channel,
+                                note=note.note, 
+                                velocity=velocity_value if set_velocity else note.velocity,
                                 time=0)  # 稍后我们会计算正确的delta时间
             
             # 创建音符结束事件
             note_off = mido.Message('note_off',
-                                 channel=note['channel'],
-                                 note=note['note'],
+                                 channel=note.channel,
+                                 note=note.note,
                                  velocity=0,
                                  time=0)  # 稍后我们会计算正确的delta时间
             
             # 将音符事件添加到相应的轨道
-            track_events[track_idx].append({
-                'msg': note_on,
-                'absolute_ticks': new_start_ticks,
-                'absolute_seconds': note['start_seconds']
-            })
-            
-            track_events[track_idx].append({
-                'msg': note_off,
-                'absolute_ticks': new_end_ticks,
-                'absolute_seconds': note['end_seconds']
-            })
+            track_events[track_idx].append((new_start_ticks, next(seq), note_on, True))
+            track_events[track_idx].append((new_end_ticks, next(seq), note_off, True))
         
         # 按时间顺序排序并计算delta时间
         for track_idx, events in enumerate(track_events):
-            events.sort(key=lambda x: x['absolute_ticks'])
+            # 元组直接比较（序号唯一，不会比较到消息本身），不需要key函数
+            events.sort()
             
+            new_track = new_midi.tracks[track_idx]
             last_tick = 0
-            for event in events:
-                # 计算delta时间
-                delta_ticks = event['absolute_ticks'] - last_tick
-                last_tick = event['absolute_ticks']
+            for absolute_ticks, _, msg, is_new in events:
+                # 计算delta时间，更新事件的时间并添加到新轨道
+                if is_new:
+                    msg.time = absolute_ticks - last_tick
+                    new_track.append(msg)
+                else:
+                    new_track.append(msg.copy(time=absolute_ticks - last_tick))
+                last_tick = absolute_ticks
+        
+        return new_midi
+    
+    def _save_midi_fast(self, midi: mido.MidiFile, path: str) -> None:
+        """
+        将MIDI写入文件，输出与 mido.MidiFile.save 完全一致
+        
+        整个文件在一个bytearray中序列化后一次写出；音符和控制消息直接由属性编码，
+        其余消息仍使用 msg.bytes()。非默认字符集的文件交给mido处理。
+        
+        Args:
+            midi: 要保存的MIDI对象
+            path: 输出文件路径
+        """
+        if midi.charset != 'latin1':
+            midi.save(path)
+            return
+        if midi.type == 0 and len(midi.tracks) != 1:
+            raise ValueError('type 0 file must have exactly 1 track')
+        
+        buf = bytearray(b'MThd')
+        buf += struct.pack('>Lhhh', 6, midi.type, len(midi.tracks), midi.ticks_per_beat)
+        
+        for track in midi.tracks:
+            buf += b'MTrk\0\0\0\0'  # 长度稍后回填
+            start = len(buf)
+            running_status = None
+            pending = 0  # 被移除的end_of_track累积的时间
+            
+            for msg in track:
+                msg_type = msg.type
+                if msg_type == 'end_of_track':
+                    pending += msg.time
+                    continue
                 
-                # 更新事件的时间
-                new_msg = event['msg'].copy(time=delta_ticks)
+                delta = msg.time + pending
+                pending = 0
+                if delta.__class__ is not int or delta < 0:
+                    raise ValueError('message time must be a non-negative int in MIDI file')
+                
+                # 写入变长delta时间（绝大多数小于128，只占一个字节）
+                if delta < 0x80:
+                    buf.append(delta)
+                else:
+                    buf += self._encode_variable_int(delta)
                 
-                # 添加到新轨道
-                new_midi.tracks[track_idx].append(new_msg)
+                status_base = _FAST_STATUS.get(msg_type)
+                if status_base is not None:
+                    status = status_base | msg.channel
+                    if status != running_status:
+                        buf.append(status)
+                        running_status = status
+                    if status_base == 0xB0:
+                        buf.append(msg.control)
+                        buf.append(msg.value)
+                    else:
+                        buf.append(msg.note)
+                        buf.append(msg.velocity)
+                elif msg.is_meta:
+                    buf.extend(msg.bytes())
+                    running_status = None
+                elif msg_type == 'sysex':
+                    buf.append(0xF0)
+                    buf += self._encode_variable_int(len(msg.data) + 1)
+                    buf.extend(msg.data)
+                    buf.append(0xF7)
+                    running_status = None
+                else:
+                    if msg.is_realtime:
+                        raise ValueError('realtime messages are not allowed in MIDI files')
+                    msg_bytes = msg.bytes()
+                    status = msg_bytes[0]
+                    if status == running_status:
+                        buf.extend(msg_bytes[1:])
+                    else:
+                        buf.extend(msg_bytes)
+                    running_status = status if status < 0xF0 else None
+            
+            # 结尾统一补一个end_of_track
+            buf += self._encode_variable_int(pending)
+            buf += b'\xff\x2f\x00'
+            struct.pack_into('>L', buf, start - 4, len(buf) - start)
         
-        return new_midi
+        with open(path, 'wb') as outfile:
+            outfile.write(buf)
+    
+    @staticmethod
+    def _encode_variable_int(value: int) -> bytes:
+        """将非负整数编码为MIDI变长整数"""
+        vlq = [value & 0x7F]
+        value >>= 7
+        while value:
+            vlq.append((value & 0x7F) | 0x80)
+            value >>= 7
+        return bytes(reversed(vlq))
     
     def _calculate_measure_beat(self, ticks, ticks_per_beat):
         """计算小节:拍位置（假设4/4拍）"""
         beats = ticks / ticks_per_beat
-        measures = int(beats / 4)  # 假设4/4拍
-        beat_in_measure = beats % 4
-        return f"{measures+1}:{beat_in_measure+1:.2f}"
+        return f"{int(beats / 4) + 1}:{beats % 4 + 1:.2f}"
     
-    def _analyze_tempo(self, midi: mido.MidiFile) -> None:
+    def _analyze_tempo(self, midi: mido.MidiFile, scan: Optional[ScanResult] = None) -> None:
         """
         分析MIDI文件中的速度信息
         直接读取MIDI中的tempo元信息，不进行任何计算或检测
         收集所有速度变化点的绝对时间和速度值
+        
+        Args:
+            midi: MIDI文件
+            scan: 已有的扫描结果，为None时重新扫描
         """
         self.tempo_changes = []
         self.original_tempo = None
         self.detailed_tempos = []
         
-        # 首先收集所有轨道中的所有tempo变化
-        all_tempo_events = []
+        if scan is None:
+            scan = self._scan_tracks(midi)
         
-        # 收集所有音符，用于验证
-        all_note_events = []
+        # 所有轨道中的所有tempo变化 [(绝对tick, tempo, 轨道索引)]
+        all_tempo_events = list(scan.tempo_events)
         
-        print(f"MIDI格式: {midi.type}, Ticks per beat: {midi.ticks_per_beat}")
+        self._log(f"MIDI格式: {midi.type}, Ticks per beat: {midi.ticks_per_beat}")
         
         # 如果是FORMAT 1的MIDI，第一轨通常是tempo轨
         # 如果是FORMAT 0，所有事件在同一轨
-        for i, track in enumerate(midi.tracks):
-            absolute_time = 0  # 累积tick时间
-            
-            print(f"\n轨道 {i+1} ({len(track)} 个事件):")
-            tempo_count_in_track = 0
-            
-            for msg in track:
-                absolute_time += msg.time
-                
-                if msg.type == 'set_tempo':
+        # 逐轨道列出速度变化仅用于日志
+        if self.debug_mode:
+            for i, track_length in enumerate(scan.track_lengths):
+                self._log(f"\n轨道 {i+1} ({track_length} 个事件):")
+                tempo_count_in_track = 0
+            
+                for absolute_time, tempo, track_idx in all_tempo_events:
+                    if track_idx != i:
+                        continue
                     tempo_count_in_track += 1
-                    # 记录tempo变化的绝对tick位置和速度
-                    all_tempo_events.append((absolute_time, msg.tempo, i))
-                    print(f"  速度变化 {tempo_count_in_track}: 位置 {absolute_time} ticks, "
-                          f"速度: {60000000/msg.tempo:.2f} BPM ({msg.tempo} μs/beat), "
-                          f"小节位置: {self._calculate_measure_beat(absolute_time, midi.ticks_per_beat)}")
-                
-                elif msg.type == 'note_on' and msg.velocity > 0:
-                    # 记录音符事件用于验证
-                    all_note_events.append((absolute_time, i, msg))
+                    self._log(f"  速度变化 {tempo_count_in_track}: 位置 {absolute_time} ticks, "
+                              f"速度: {60000000/tempo:.2f} BPM ({tempo} μs/beat), "
+                              f"小节位置: {self._calculate_measure_beat(absolute_time, midi.ticks_per_beat)}")
         
         # 按绝对时间排序所有tempo变化
-        all_tempo_events.sort(key=lambda x: x[0])
+        # 之后的 self.tempo_changes 都由此构建，始终按tick排序，使用时无需再次排序
+        all_tempo_events.sort(key=_first_item)
         
-        print(f"\n检测到总共 {len(all_tempo_events)} 个速度变化点:")
+        self._log(f"\n检测到总共 {len(all_tempo_events)} 个速度变化点:")
         
         # 如果有tempo变化，计算每个变化点的秒数位置
         if all_tempo_events:
@@ -948,55 +1155,64 @@ class MidiProcessor:
             
             # 确保第一个tempo变化的时间为0
             if all_tempo_events[0][0] > 0:
-                print(f"首个tempo变化不在0点，在 {all_tempo_events[0][0]} ticks，添加初始tempo事件")
+                self._log(f"首个tempo变化不在0点，在 {all_tempo_events[0][0]} ticks，添加初始tempo事件")
                 first_tempo = all_tempo_events[0][1]
                 self.tempo_changes = [(0, first_tempo)] + [(t[0], t[1]) for t in all_tempo_events]  # 添加0时刻的速度
                 all_tempo_events.insert(0, (0, first_tempo, -1))  # -1表示这是程序添加的
             else:
                 self.tempo_changes = [(t[0], t[1]) for t in all_tempo_events]
             
+            self._build_tempo_prefix(midi.ticks_per_beat)
+            
             # 计算每个tempo变化点的绝对秒数位置
-            calculated_tempos = []
-            for idx, (tick_pos, tempo, track_idx) in enumerate(all_tempo_events):
-                seconds = self._calculate_absolute_time_with_tempo_changes(
-                    tick_pos, 
-                    [(t[0], t[1]) for t in all_tempo_events[:idx+1]],  # 转换为 (ticks, tempo) 对
-                    midi.ticks_per_beat
-                )
-                measure_beat = self._calculate_measure_beat(tick_pos, midi.ticks_per_beat)
-                calculated_tempos.append((tick_pos, tempo, seconds, measure_beat))
-                print(f"  {idx+1}. 时间位置: {tick_pos} ticks ({seconds:.3f} 秒), "
-                      f"小节位置: {measure_beat}, "
-                      f"速度: {self._tempo_to_bpm(tempo):.2f} BPM ({tempo} μs/beat), "
-                      f"轨道: {track_idx+1}")
+            ticks_per_beat = midi.ticks_per_beat
+            seconds_list = self._ticks_to_absolute_seconds_batch([event[0] for event in all_tempo_events])
+            calculated_tempos = [
+                (tick_pos, tempo, seconds, self._calculate_measure_beat(tick_pos, ticks_per_beat))
+                for (tick_pos, tempo, _), seconds in zip(all_tempo_events, seconds_list)
+            ]
+            
+            # 日志行只在需要输出时才格式化
+            if self.debug_mode:
+                for idx, (tick_pos, tempo, seconds, measure_beat) in enumerate(calculated_tempos):
+                    track_idx = all_tempo_events[idx][2]
+                    self._log(f"  {idx+1}. 时间位置: {tick_pos} ticks ({seconds:.3f} 秒), "
+                              f"小节位置: {measure_beat}, "
+                              f"速度: {self._tempo_to_bpm(tempo):.2f} BPM ({tempo} μs/beat), "
+                              f"轨道: {track_idx+1}")
             
             self.detailed_tempos = calculated_tempos
         else:
             # 如果没有找到速度信息，使用MIDI默认速度（500000微秒/拍，相当于120 BPM）
             self.original_tempo = 500000
             self.tempo_changes = [(0, 500000)]  # 添加一个初始点
+            self._build_tempo_prefix(midi.ticks_per_beat)
             self.detailed_tempos = [(0, 500000, 0.0, "1:1.00")]
-            print(f"警告: 未找到速度信息，使用默认值 120 BPM")
+            self._log(f"警告: 未找到速度信息，使用默认值 120 BPM")
         
         # 验证音符位置
-        if all_note_events:
-            all_note_events.sort(key=lambda x: x[0])
-            first_note = all_note_events[0]
-            seconds = self._calculate_absolute_time_with_tempo_changes(
-                first_note[0], 
-                self.tempo_changes,
-                midi.ticks_per_beat
-            )
+        if self.debug_mode and scan.first_note is not None:
+            first_note = scan.first_note
+            seconds = self._ticks_to_absolute_seconds(first_note[0])
             measure_beat = self._calculate_measure_beat(first_note[0], midi.ticks_per_beat)
-            print(f"\n首个音符在 {first_note[0]} ticks ({seconds:.3f} 秒), "
-                  f"小节位置: {measure_beat}, 轨道 {first_note[1]+1}")
+            self._log(f"\n首个音符在 {first_note[0]} ticks ({seconds:.3f} 秒), "
+                      f"小节位置: {measure_beat}, 轨道 {first_note[1]+1}")
             
+    def _percent_to_velocity(self, velocity_percent: int) -> int:
+        """将力度百分比转换为MIDI力度值（范围1-127）"""
+        return min(127, max(1, int(127 * velocity_percent / 100)))
+    
     def _tempo_to_bpm(self, tempo: int) -> float:
         """将微秒/拍转换为BPM"""
         if tempo <= 0:
             return 120.0  # 防止除零错误
         return round(60000000 / tempo, 2)
     
+    def _tempos_to_bpms(self, tempos: List[int]) -> List[float]:
+        """批量将微秒/拍转换为BPM（变速文件中tempo值大量重复，每个不同的tempo只换算一次）"""
+        bpm_by_tempo = {tempo: self._tempo_to_bpm(tempo) for tempo in set(tempos)}
+        return [bpm_by_tempo[tempo] for tempo in tempos]
+    
     def _bpm_to_tempo(self, bpm: float) -> int:
         """将BPM转换为微秒/拍"""
         if bpm <= 0:
@@ -1048,79 +1264,138 @@ class MidiProcessor:
         beats = seconds / seconds_per_beat
         return round(beats * ticks_per_beat)
     
-    def _calculate_absolute_time_with_tempo_changes(self, absolute_ticks: int, tempo_changes: List[Tuple[int, int]], ticks_per_beat: int) -> float:
+    def _seconds_to_ticks_precise_batch(self, seconds_list: List[float], tempo: int, ticks_per_beat: int) -> List[int]:
         """
-        计算考虑所有tempo变化的绝对时间（秒）
+        批量将秒转换为MIDI ticks，结果与逐个调用 _seconds_to_ticks_precise 相同
         
         Args:
-            absolute_ticks: 事件的绝对tick位置
-            tempo_changes: 所有速度变化的列表，按时间排序 [(tick_pos, tempo),...]
+            seconds_list: 秒列表
+            tempo: 微秒/拍
             ticks_per_beat: 每拍的ticks数
             
         Returns:
-            绝对时间（秒）
+            MIDI ticks列表
         """
-        if not tempo_changes:
-            return 0.0
+        seconds_per_beat = tempo / 1000000.0
+        return [round(seconds / seconds_per_beat * ticks_per_beat) for seconds in seconds_list]
+    
+    def _build_tempo_prefix(self, ticks_per_beat: int) -> None:
+        """
+        根据 self.tempo_changes 建立速度前缀表，之后每次tick→秒的换算只需一次二分查找
+        
+        Args:
+            ticks_per_beat: 每拍的ticks数
+        """
+        # self.tempo_changes 在 _analyze_tempo 中已按tick排序
+        self._tempo_prefix = self._make_tempo_prefix(self.tempo_changes, ticks_per_beat, is_sorted=True)
+        self._tempo_prefix_ticks = [entry[0] for entry in self._tempo_prefix]
+        self._tempo_prefix_tpb = ticks_per_beat
+    
+    @staticmethod
+    def _make_tempo_prefix(tempo_changes: List[Tuple[int, int]], ticks_per_beat: int,
+                           is_sorted: bool = False) -> List[Tuple[int, float, int]]:
+        """
+        建立速度前缀表 [(tick位置, 该位置的绝对秒数, 之后的tempo)]
+        
+        各速度段的秒数用分数精确累加，只在存入表中时转换为浮点数，
+        速度变化很多时也不会累积浮点误差；每段只计算一次，不影响之后的查找
+        
+        Args:
+            tempo_changes: 速度变化列表 [(tick_pos, tempo),...]
+            ticks_per_beat: 每拍的ticks数
+            is_sorted: tempo_changes是否已按tick排序（已排序时不再复制排序）
             
-        # 确保tempo_changes按tick位置排序
-        sorted_tempo_changes = sorted(tempo_changes, key=lambda x: x[0])
+        Returns:
+            速度前缀表
+        """
+        sorted_tempo_changes = tempo_changes if is_sorted else sorted(tempo_changes, key=_first_item)
+        if not sorted_tempo_changes:
+            sorted_tempo_changes = [(0, 500000)]
         
-        # 总时间
-        total_seconds = 0.0
+        # 第一个速度变化之前按第一个速度计算
         last_tick_pos = 0
-        last_tempo = sorted_tempo_changes[0][1]  # 使用第一个速度
+        last_tempo = sorted_tempo_changes[0][1]
+        total_seconds = Fraction(0)
+        seconds_denominator = ticks_per_beat * 1000000  # 秒数 = tick数 × tempo / (ticks_per_beat × 10^6)
+        prefix = [(0, 0.0, last_tempo)]
         
-        if self.debug_mode and absolute_ticks > 0 and absolute_ticks % 10000 == 0:
-            print(f"\n计算 {absolute_ticks} ticks 的绝对时间:")
-            print(f"  起始tempo: {self._tempo_to_bpm(last_tempo):.2f} BPM ({last_tempo} μs/beat)")
-        
-        # 遍历所有tempo变化
         for tick_pos, tempo in sorted_tempo_changes:
-            # 如果事件在当前tempo变化点之前
-            if absolute_ticks <= tick_pos:
-                # 添加从上一个tempo变化点到事件位置的时间
-                tick_duration = absolute_ticks - last_tick_pos
-                time_segment = self._ticks_to_seconds(tick_duration, last_tempo, ticks_per_beat)
-                total_seconds += time_segment
-                
-                if self.debug_mode and absolute_ticks > 0 and absolute_ticks % 10000 == 0:
-                    print(f"  事件在 {tick_pos} ticks 之前，当前位置 {absolute_ticks} ticks")
-                    print(f"  从 {last_tick_pos} 到 {absolute_ticks} = {tick_duration} ticks @ {self._tempo_to_bpm(last_tempo):.2f} BPM = {time_segment:.6f} 秒")
-                    print(f"  总时间: {total_seconds:.6f} 秒")
-                
-                return total_seconds
-            
-            # 否则，添加从上一个tempo变化点到当前变化点的时间
-            tick_duration = tick_pos - last_tick_pos
-            time_segment = self._ticks_to_seconds(tick_duration, last_tempo, ticks_per_beat)
-            total_seconds += time_segment
-            
-            if self.debug_mode and absolute_ticks > 0 and absolute_ticks % 10000 == 0:
-                print(f"  从 {last_tick_pos} 到 {tick_pos} = {tick_duration} ticks @ {self._tempo_to_bpm(last_tempo):.2f} BPM = {time_segment:.6f} 秒")
-                print(f"  累计时间: {total_seconds:.6f} 秒")
-                print(f"  速度变化为 {self._tempo_to_bpm(tempo):.2f} BPM ({tempo} μs/beat)")
-            
-            # 更新上一个位置和tempo
+            total_seconds += Fraction((tick_pos - last_tick_pos) * last_tempo, seconds_denominator)
+            prefix.append((tick_pos, float(total_seconds), tempo))
             last_tick_pos = tick_pos
             last_tempo = tempo
         
-        # 如果事件在所有tempo变化之后
-        tick_duration = absolute_ticks - last_tick_pos
-        time_segment = self._ticks_to_seconds(tick_duration, last_tempo, ticks_per_beat)
-        total_seconds += time_segment
+        return prefix
+    
+    def _ticks_to_absolute_seconds(self, absolute_ticks: int) -> float:
+        """
+        使用速度前缀表将绝对tick位置换算为绝对秒数（需先调用 _analyze_tempo）
+        
+        Args:
+            absolute_ticks: 事件的绝对tick位置
+            
+        Returns:
+            绝对时间（秒）
+        """
+        idx = bisect_right(self._tempo_prefix_ticks, absolute_ticks) - 1
+        if idx < 0:
+            return 0.0
+        base_tick, base_seconds, tempo = self._tempo_prefix[idx]
+        beats = (absolute_ticks - base_tick) / self._tempo_prefix_tpb
+        return base_seconds + beats * (tempo / 1000000.0)
+    
+    def _ticks_to_absolute_seconds_batch(self, ticks_list: List[int]) -> List[float]:
+        """
+        批量将绝对tick位置换算为绝对秒数，结果与逐个调用 _ticks_to_absolute_seconds 相同
         
-        if self.debug_mode and absolute_ticks > 0 and absolute_ticks % 10000 == 0:
-            print(f"  事件在所有tempo变化之后，最后位置 {last_tick_pos} ticks")
-            print(f"  从 {last_tick_pos} 到 {absolute_ticks} = {tick_duration} ticks @ {self._tempo_to_bpm(last_tempo):.2f} BPM = {time_segment:.6f} 秒")
-            print(f"  总时间: {total_seconds:.6f} 秒")
+        Args:
+            ticks_list: 绝对tick位置列表
+            
+        Returns:
+            绝对时间（秒）列表
+        """
+        prefix = self._tempo_prefix
+        prefix_ticks = self._tempo_prefix_ticks
+        ticks_per_beat = self._tempo_prefix_tpb
+        
+        # 整个文件只有一个速度（最常见的情况）：不需要查找，直接按比例换算
+        if len(prefix) <= 2 and prefix and prefix[-1][0] == 0:
+            seconds_per_beat = prefix[-1][2] / 1000000.0
+            return [ticks / ticks_per_beat * seconds_per_beat if ticks >= 0 else 0.0
+                    for ticks in ticks_list]
+        
+        result = []
+        append = result.append
+        for ticks in ticks_list:
+            idx = bisect_right(prefix_ticks, ticks) - 1
+            if idx < 0:
+                append(0.0)
+                continue
+            base_tick, base_seconds, tempo = prefix[idx]
+            append(base_seconds + (ticks - base_tick) / ticks_per_beat * (tempo / 1000000.0))
+        return result
+    
+    def _calculate_absolute_time_with_tempo_changes(self, absolute_ticks: int, tempo_changes: List[Tuple[int, int]], ticks_per_beat: int) -> float:
+        """
+        计算考虑所有tempo变化的绝对时间（秒）
         
-        return total_seconds
+        Args:
+            absolute_ticks: 事件的绝对tick位置
+            tempo_changes: 所有速度变化的列表，按时间排序 [(tick_pos, tempo),...]
+            ticks_per_beat: 每拍的ticks数
+            
+        Returns:
+            绝对时间（秒）
+        """
+        return self._calculate_absolute_time_with_tempo_changes_precise(absolute_ticks, tempo_changes, ticks_per_beat)
     
     def _calculate_absolute_time_with_tempo_changes_precise(self, absolute_ticks: int, tempo_changes: List[Tuple[int, int]], ticks_per_beat: int) -> float:
         """
         计算考虑所有tempo变化的绝对时间（秒），使用高精度算法
         
+        传入的就是当前文件的速度信息时直接使用已建立的速度前缀表，
+        否则临时建立一张前缀表再查找。
+        
         Args:
             absolute_ticks: 事件的绝对tick位置
             tempo_changes: 所有速度变化的列表，按时间排序 [(tick_pos, tempo),...]
@@ -1129,52 +1404,20 @@ class MidiProcessor:
         Returns:
             绝对时间（秒）
         """
-        # 基本上与原方法相同，但使用更高精度的计算
         if not tempo_changes:
             return 0.0
         
-        # 确保tempo_changes按tick位置排序
-        sorted_tempo_changes = sorted(tempo_changes, key=lambda x: x[0])
-        
-        # 总时间
-        total_seconds = 0.0
-        last_tick_pos = 0
-        last_tempo = sorted_tempo_changes[0][1]  # 使用第一个速度
-        
-        # 遍历所有tempo变化
-        for tick_pos, tempo in sorted_tempo_changes:
-            # 如果事件在当前tempo变化点之前
-            if absolute_ticks <= tick_pos:
-                # 添加从上一个tempo变化点到事件位置的时间
-                tick_duration = absolute_ticks - last_tick_pos
-                # 使用高精度计算
-                seconds_per_beat = last_tempo / 1000000.0
-                beats = tick_duration / ticks_per_beat
-                time_segment = beats * seconds_per_beat
-                total_seconds += time_segment
-                return total_seconds
-            
-            # 否则，添加从上一个tempo变化点到当前变化点的时间
-            tick_duration = tick_pos - last_tick_pos
-            # 使用高精度计算
-            seconds_per_beat = last_tempo / 1000000.0
-            beats = tick_duration / ticks_per_beat
-            time_segment = beats * seconds_per_beat
-            total_seconds += time_segment
-            
-            # 更新上一个位置和tempo
-            last_tick_pos = tick_pos
-            last_tempo = tempo
-        
-        # 如果事件在所有tempo变化之后
-        tick_duration = absolute_ticks - last_tick_pos
-        # 使用高精度计算
-        seconds_per_beat = last_tempo / 1000000.0
-        beats = tick_duration / ticks_per_beat
-        time_segment = beats * seconds_per_beat
-        total_seconds += time_segment
+        if (tempo_changes is self.tempo_changes and self._tempo_prefix
+                and ticks_per_beat == self._tempo_prefix_tpb):
+            return self._ticks_to_absolute_seconds(absolute_ticks)
         
-        return total_seconds
+        prefix = self._make_tempo_prefix(tempo_changes, ticks_per_beat)
+        idx = bisect_right([entry[0] for entry in prefix], absolute_ticks) - 1
+        if idx < 0:
+            return 0.0
+        base_tick, base_seconds, tempo = prefix[idx]
+        beats = (absolute_ticks - base_tick) / ticks_per_beat
+        return base_seconds + beats * (tempo / 1000000.0)
     
     def process_directory(self, 
                          input_dir: str, 
@@ -1187,7 +1430,9 @@ class MidiProcessor:
                          keep_original_tempo: bool = True,
                          check_overlap: bool = False,
                          fix_overlap: bool = False,
-                         multitrack_overlap: bool = False) -> List[Dict[str, Any]]:
+                         multitrack_overlap: bool = False,
+                         max_workers: int = 1,
+                         progress_callback: Optional[Callable[[int, int, ProcessResult], None]] = None) -> List[ProcessResult]:
         """
         批量处理目录中的所有MIDI文件
         
@@ -1203,102 +1448,221 @@ class MidiProcessor:
             check_overlap: 是否检测音符重叠
             fix_overlap: 是否处理重叠音符
             multitrack_overlap: 是否处理跨轨道重叠
+            max_workers: 并行处理的进程数（1=在当前进程中依次处理）
+            progress_callback: 每个文件处理完成后的回调 (序号(从1开始), 总数, 处理结果)
             
         Returns:
             包含所有处理结果的列表
         """
-        results = []
-        
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
+        # 先收集所有任务，再统一交给预读流程处理
+        jobs = []
+        
         # 遍历目录中的所有文件
         for root, _, files in os.walk(input_dir):
+            # 同一目录下的文件共用输出目录，每个目录只计算和创建一次
+            target_dir = None
             for file in files:
                 if file.lower().endswith(('.mid', '.midi')):
                     input_path = os.path.join(root, file)
                     
-                    # 计算相对路径以保持目录结构
-                    rel_path = os.path.relpath(root, input_dir)
-                    if rel_path != '.':
-                        target_dir = os.path.join(output_dir, rel_path)
-                        os.makedirs(target_dir, exist_ok=True)
-                    else:
-                        target_dir = output_dir
+                    if target_dir is None:
+                        # 计算相对路径以保持目录结构
+                        rel_path = os.path.relpath(root, input_dir)
+                        if rel_path != '.':
+                            target_dir = os.path.join(output_dir, rel_path)
+                            os.makedirs(target_dir, exist_ok=True)
+                        else:
+                            target_dir = output_dir
                     
-                    # 处理文件并收集结果
-                    result = self.process_file(
-                        input_path, 
-                        target_dir, 
-                        target_bpm, 
-                        remove_cc, 
-                        set_velocity,
-                        velocity_percent,
-                        skip_matched,
-                        keep_original_tempo,
-                        check_overlap,
-                        fix_overlap,
-                        multitrack_overlap
-                    )
+                    jobs.append((input_path, target_dir))
+        
+        return self._process_jobs(
+            jobs,
+            dict(target_bpm=target_bpm,
+                 remove_cc=remove_cc,
+                 set_velocity=set_velocity,
+                 velocity_percent=velocity_percent,
+                 skip_matched=skip_matched,
+                 keep_original_tempo=keep_original_tempo,
+                 check_overlap=check_overlap,
+                 fix_overlap=fix_overlap,
+                 multitrack_overlap=multitrack_overlap),
+            progress_callback=progress_callback,
+            max_workers=max_workers
+        )
+    
+    def process_files(self,
+                      inputs: Iterable[str],
+                      output_dir: str,
+                      progress_callback: Optional[Callable[[int, int, ProcessResult], None]] = None,
+                      max_workers: int = 1,
+                      **kwargs) -> List[ProcessResult]:
+        """
+        批量处理文件列表
+        
+        max_workers为1时在当前进程中依次处理，后台线程预读后续文件以掩盖磁盘读取耗时；
+        大于1时各文件之间没有依赖，交给多个进程并行处理。
+        
+        Args:
+            inputs: 输入MIDI文件路径列表
+            output_dir: 输出目录
+            progress_callback: 每个文件处理完成后的回调 (序号(从1开始), 总数, 处理结果)
+            max_workers: 并行处理的进程数
+            **kwargs: 传给process_file的处理选项
+            
+        Returns:
+            包含所有处理结果的列表
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        jobs = [(path, output_dir) for path in inputs]
+        return self._process_jobs(jobs, kwargs, progress_callback, max_workers)
+    
+    def _process_jobs(self,
+                      jobs: List[Tuple[str, str]],
+                      options: Dict[str, Any],
+                      progress_callback: Optional[Callable[[int, int, ProcessResult], None]] = None,
+                      max_workers: int = 1,
+                      prefetch: int = 2) -> List[ProcessResult]:
+        """
+        依次处理(输入文件, 输出目录)任务，同时在后台线程中提前加载后续的MIDI文件
+        
+        解析和处理仍在当前线程串行进行，预读只用于让文件读取与上一个文件的
+        分析、保存重叠进行。预读失败的文件交回process_file重新加载，由其报告错误。
+        
+        Args:
+            jobs: (输入文件路径, 输出目录) 列表
+            options: 传给process_file的处理选项
+            progress_callback: 每个文件处理完成后的回调 (序号(从1开始), 总数, 处理结果)
+            max_workers: 并行处理的进程数（大于1时改用进程池，不再预读；进程池失败时剩余文件回退为依次处理）
+            prefetch: 最多提前加载的文件数
+            
+        Returns:
+            包含所有处理结果的列表
+        """
+        results = []
+        total = len(jobs)
+        if not total:
+            return results
+        
+        # 多进程并行：每个子进程创建独立的MidiProcessor，结果按任务顺序返回
+        if max_workers > 1 and total > 1:
+            max_workers = min(max_workers, total)
+            chunksize = max(1, min(4, total // (max_workers * 2)))
+            tasks = [(input_path, target_dir, options) for input_path, target_dir in jobs]
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                outputs = executor.map(_process_one, tasks, chunksize=chunksize)
+                while True:
+                    # 只捕获取结果时的进程池错误，回调中的异常照常抛出
+                    try:
+                        result = next(outputs)
+                    except StopIteration:
+                        break
+                    except _POOL_ERRORS as e:
+                        # 进程池失败后，尚未完成的文件改为在当前进程中依次处理，
+                        # 由process_file逐个报告错误
+                        print(f"并行处理失败: {e}，剩余 {total - len(results)} 个文件改为依次处理")
+                        break
                     results.append(result)
+                    if progress_callback is not None:
+                        progress_callback(len(results), total, result)
+            if len(results) == total:
+                return results
+        
+        start = len(results)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = deque()
+            next_job = start
+            
+            for index in range(start, total):
+                input_path, target_dir = jobs[index]
+                # 补齐预读队列（包含当前文件在内最多 prefetch 个）
+                while next_job < total and len(pending) < prefetch:
+                    pending.append(executor.submit(mido.MidiFile, jobs[next_job][0]))
+                    next_job += 1
+                
+                try:
+                    midi = pending.popleft().result()
+                except Exception:
+                    midi = None
+                
+                result = self.process_file(input_path, target_dir, midi=midi, **options)
+                results.append(result)
+                
+                if progress_callback is not None:
+                    progress_callback(index + 1, total, result)
         
         return results
     
-    def detect_midi_overlaps(self, midi_path: str) -> Dict[str, Any]:
+    def detect_midi_overlaps(self, midi_or_path) -> Dict[str, Any]:
         """
         检测MIDI文件中的音符重叠
         
         Args:
-            midi_path: MIDI文件路径
+            midi_or_path: 已加载的MIDI文件对象，或MIDI文件路径
             
         Returns:
             包含重叠检测结果的字典
         """
         try:
-            mid = mido.MidiFile(midi_path)
+            mid = self._load_midi(midi_or_path)
+            ticks_per_beat = mid.ticks_per_beat
             overlaps = []
             tempo = 500000  # 默认 tempo
             
-            # 获取第一个tempo信息
-            for msg in mid:
-                if msg.type == 'set_tempo':
-                    tempo = msg.tempo
-                    break
+            seen_overlaps = set()
+            
+            # 获取第一个tempo信息（绝对时间最早的set_tempo，时间相同时按轨道顺序）
+            first_tempo_tick = None
+            for track in mid.tracks:
+                current_time = 0
+                for msg in track:
+                    current_time += msg.time
+                    if first_tempo_tick is not None and current_time >= first_tempo_tick:
+                        break
+                    if msg.type == 'set_tempo':
+                        first_tempo_tick = current_time
+                        tempo = msg.tempo
+                        break
 
             for track_idx, track in enumerate(mid.tracks):
                 current_time = 0
-                active_notes = []
+                active_notes = []  # 按开始时间排列的音符 [start, end, channel, note]
+                open_notes = defaultdict(deque)  # {(channel, note): [尚未结束的音符, 先进先出]}
 
                 for msg in track:
                     current_time += msg.time
 
                     if msg.type == 'note_on' and msg.velocity > 0:
-                        active_notes.append({
-                            'channel': msg.channel,
-                            'note': msg.note,
-                            'start': current_time,
-                            'end': None
-                        })
+                        note = [current_time, None, msg.channel, msg.note]
+                        active_notes.append(note)
+                        open_notes[(msg.channel, msg.note)].append(note)
                     elif (msg.type == 'note_off') or (msg.type == 'note_on' and msg.velocity == 0):
-                        for note in active_notes:
-                            if note['channel'] == msg.channel and note['note'] == msg.note and note['end'] is None:
-                                note['end'] = current_time
-                                break
-
-                for i in range(len(active_notes)):
-                    for j in range(i + 1, len(active_notes)):
-                        note1 = active_notes[i]
-                        note2 = active_notes[j]
+                        pending = open_notes.get((msg.channel, msg.note))
+                        if pending:
+                            pending.popleft()[1] = current_time
 
-                        if note1['end'] is not None and note2['end'] is not None:
-                            if note1['start'] < note2['end'] and note2['start'] < note1['end']:
-                                overlap_start = max(note1['start'], note2['start'])
-                                overlap_end = min(note1['end'], note2['end'])
-                                formatted_overlap_start = self._format_time(overlap_start, mid.ticks_per_beat, tempo)
-                                formatted_overlap_end = self._format_time(overlap_end, mid.ticks_per_beat, tempo)
-                                overlap_info = f"{formatted_overlap_start} - {formatted_overlap_end}"
-                                if overlap_info not in overlaps:
-                                    overlaps.append(overlap_info)
+                # 扫描线：音符按开始时间排列，后面的音符一旦开始于note1结束之后就不会再与note1重叠
+                note_count = len(active_notes)
+                for i in range(note_count):
+                    start1, end1 = active_notes[i][0], active_notes[i][1]
+                    if end1 is None:
+                        continue
+                    for j in range(i + 1, note_count):
+                        start2, end2 = active_notes[j][0], active_notes[j][1]
+                        if start2 >= end1:
+                            break
+                        if end2 is not None and start1 < end2:
+                            overlap_start = max(start1, start2)
+                            overlap_end = min(end1, end2)
+                            formatted_overlap_start = self._format_time(overlap_start, ticks_per_beat, tempo)
+                            formatted_overlap_end = self._format_time(overlap_end, ticks_per_beat, tempo)
+                            overlap_info = f"{formatted_overlap_start} - {formatted_overlap_end}"
+                            if overlap_info not in seen_overlaps:
+                                seen_overlaps.add(overlap_info)
+                                overlaps.append(overlap_info)
 
             return {
                 'has_overlap': bool(overlaps),
@@ -1311,6 +1675,48 @@ class MidiProcessor:
                 'overlaps': [f"处理文件时出错: {str(e)}"]
             }
     
+    def _load_midi(self, midi_or_path) -> mido.MidiFile:
+        """如果传入的是路径则加载MIDI文件，已加载的MidiFile对象原样返回"""
+        if isinstance(midi_or_path, mido.MidiFile):
+            return midi_or_path
+        return mido.MidiFile(midi_or_path)
+    
+    @staticmethod
+    def _format_seconds(seconds: float) -> str:
+        """将秒数格式化为 MM:SS.mmm（先四舍五入到整数毫秒，再用整数divmod拆分）"""
+        total_secs, milliseconds = divmod(int(seconds * 1000 + 0.5), 1000)
+        minutes, secs = divmod(total_secs, 60)
+        return f"{minutes:02d}:{secs:02d}.{milliseconds:03d}"
+    
+    @classmethod
+    def format_overlap(cls, detail: Dict[str, Any]) -> str:
+        """
+        生成一处多轨重叠的描述文字
+        
+        Args:
+            detail: detect_multitrack_overlaps 返回的 overlap_details 中的一项
+            
+        Returns:
+            描述文字
+        """
+        note1 = detail['note1']
+        note2 = detail['note2']
+        format_seconds = cls._format_seconds
+        
+        if detail['same_track']:
+            track_info = f"轨道{note1.original_track+1}"
+        else:
+            track_info = f"轨道{note1.original_track+1} vs 轨道{note2.original_track+1}"
+        overlap_type = "同音符" if detail['same_note'] else "不同音符"
+        
+        return (
+            f"{track_info}: "
+            f"音符{note1.note} [{format_seconds(note1.start_seconds)}-{format_seconds(note1.end_seconds)}] vs "
+            f"音符{note2.note} [{format_seconds(note2.start_seconds)}-{format_seconds(note2.end_seconds)}] "
+            f"重叠[{format_seconds(detail['overlap_start'])}-{format_seconds(detail['overlap_end'])}] "
+            f"持续{detail['overlap_duration']:.3f}s ({overlap_type})"
+        )
+    
     def _format_time(self, ticks: int, ticks_per_beat: int, tempo: int) -> str:
         """
         将MIDI ticks转换为时间格式
@@ -1330,7 +1736,7 @@ class MidiProcessor:
         milliseconds = int((total_seconds % 1) * 100)
         return f"{minutes:02}:{seconds:02}.{milliseconds:02}"
     
-    def fix_overlapping_notes(self, note_positions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def fix_overlapping_notes(self, note_positions: List[Note]) -> List[Note]:
         """
         处理重叠的音符
         
@@ -1348,32 +1754,27 @@ class MidiProcessor:
         if not note_positions:
             return note_positions
         
-        print(f"开始处理 {len(note_positions)} 个音符")
+        self._log(f"开始处理 {len(note_positions)} 个音符")
         
-        # 按通道分组处理
-        channel_groups = {}
+        # 按通道分组处理（在这里复制音符，后续裁剪直接修改副本，不改动传入的音符）
+        channel_groups = defaultdict(list)
         for note in note_positions:
-            channel = note['channel']
-            if channel not in channel_groups:
-                channel_groups[channel] = []
-            channel_groups[channel].append(note)
+            note = note.copy()
+            channel_groups[note.channel].append(note)
         
         fixed_notes = []
         
         for channel, notes in channel_groups.items():
-            print(f"处理通道 {channel}: {len(notes)} 个音符")
+            self._log(f"处理通道 {channel}: {len(notes)} 个音符")
             
-            # 按开始时间排序
-            sorted_notes = sorted(notes, key=lambda x: x['start_seconds'])
-            
-            # 使用扫描线算法处理重叠
-            channel_fixed = self._fix_channel_overlaps(sorted_notes)
+            # 使用扫描线算法处理重叠（_fix_channel_overlaps 内部按开始时间排序）
+            channel_fixed = self._fix_channel_overlaps(notes)
             fixed_notes.extend(channel_fixed)
         
-        print(f"处理完成：{len(note_positions)} 个音符 -> {len(fixed_notes)} 个音符")
+        self._log(f"处理完成：{len(note_positions)} 个音符 -> {len(fixed_notes)} 个音符")
         return fixed_notes
 
-    def collect_multitrack_note_positions(self, midi: mido.MidiFile) -> List[Dict[str, Any]]:
+    def collect_multitrack_note_positions(self, midi: mido.MidiFile) -> List[Note]:
         """
         收集多轨MIDI文件中所有音符的位置信息
         
@@ -1383,123 +1784,156 @@ class MidiProcessor:
         Returns:
             包含所有轨道音符位置信息的列表，每个音符都标记了原始轨道信息
         """
-        all_notes = []
-        
-        for track_idx, track in enumerate(midi.tracks):
-            absolute_time_ticks = 0
-            # 使用栈来正确处理重叠的相同音符
-            active_notes = {}  # {(note, channel): [stack of start_info]}
-            
-            for msg_idx, msg in enumerate(track):
-                absolute_time_ticks += msg.time
-                
-                if msg.type == 'note_on' and msg.velocity > 0:
-                    # 记录音符开始
-                    note_key = (msg.note, msg.channel)
-                    if note_key not in active_notes:
-                        active_notes[note_key] = []
-                    
-                    # 使用栈结构处理重叠的相同音符
-                    active_notes[note_key].append({
-                        'start_tick': absolute_time_ticks,
-                        'velocity': msg.velocity
-                    })
-                
-                elif (msg.type == 'note_off' or 
-                      (msg.type == 'note_on' and msg.velocity == 0)):
-                    # 找到音符结束
-                    note_key = (msg.note, msg.channel)
-                    if note_key in active_notes and active_notes[note_key]:
-                        # 使用FIFO（先进先出）处理重叠音符
-                        start_info = active_notes[note_key].pop(0)
-                        start_tick = start_info['start_tick']
-                        velocity = start_info['velocity']
-                        duration_ticks = absolute_time_ticks - start_tick
-                        
-                        # 使用高精度计算秒位置
-                        start_seconds = self._calculate_absolute_time_with_tempo_changes_precise(
-                            start_tick, self.tempo_changes, midi.ticks_per_beat
-                        )
-                        end_seconds = self._calculate_absolute_time_with_tempo_changes_precise(
-                            absolute_time_ticks, self.tempo_changes, midi.ticks_per_beat
-                        )
-                        duration_seconds = end_seconds - start_seconds
-                        
-                        # 记录音符信息，包含原始轨道信息
-                        note_info = {
-                            'track': track_idx,
-                            'original_track': track_idx,  # 保存原始轨道索引
-                            'note': msg.note,
-                            'channel': msg.channel,
-                            'velocity': velocity,
-                            'start_tick': start_tick,
-                            'end_tick': absolute_time_ticks,
-                            'start_seconds': start_seconds,
-                            'end_seconds': end_seconds,
-                            'duration_ticks': duration_ticks,
-                            'duration_seconds': duration_seconds
-                        }
-                        
-                        all_notes.append(note_info)
-                        
-                        # 如果这个音符的栈空了，删除key
-                        if not active_notes[note_key]:
-                            del active_notes[note_key]
-        
-        # 检查是否有未配对的note_on事件
+        note_pairs = []  # 所有轨道已配对的音符 [(track_idx, note, channel, velocity, start_tick, end_tick)]
         total_unmatched = 0
+        note_types = _NOTE_MSG_TYPES
+        
         for track_idx, track in enumerate(midi.tracks):
-            # 重新计算该轨道的未配对事件
-            track_unmatched = 0
             absolute_time_ticks = 0
-            active_notes = {}
+            # 使用队列来正确处理重叠的相同音符，按 (channel << 7) | note 索引 [deque([(start_tick, velocity), ...]) 或 None]
+            active_notes = [None] * _NOTE_SLOT_COUNT
             
             for msg in track:
                 absolute_time_ticks += msg.time
+                msg_type = msg.type
+                if msg_type not in note_types:
+                    continue
                 
-                if msg.type == 'note_on' and msg.velocity > 0:
-                    note_key = (msg.note, msg.channel)
-                    if note_key not in active_notes:
-                        active_notes[note_key] = []
-                    active_notes[note_key].append(absolute_time_ticks)
+                # 每个属性只读取一次（mido消息的属性访问开销较大）
+                note = msg.note
+                channel = msg.channel
+                velocity = msg.velocity
                 
-                elif (msg.type == 'note_off' or 
-                      (msg.type == 'note_on' and msg.velocity == 0)):
-                    note_key = (msg.note, msg.channel)
-                    if note_key in active_notes and active_notes[note_key]:
-                        active_notes[note_key].pop(0)
-                        if not active_notes[note_key]:
-                            del active_notes[note_key]
-            
-            track_unmatched = sum(len(stack) for stack in active_notes.values())
-            total_unmatched += track_unmatched
+                slot = (channel << 7) | note
+                if velocity and msg_type == 'note_on':
+                    # 记录音符开始，使用队列处理重叠的相同音符
+                    stack = active_notes[slot]
+                    if stack is None:
+                        stack = active_notes[slot] = deque()
+                    stack.append((absolute_time_ticks, velocity))
+                else:
+                    # 找到音符结束（note_off 或力度为0的note_on）
+                    stack = active_notes[slot]
+                    if stack:
+                        # 使用FIFO（先进先出）处理重叠音符
+                        start_tick, start_velocity = stack.popleft()
+                        note_pairs.append((track_idx, note, channel, start_velocity,
+                                           start_tick, absolute_time_ticks))
             
+            # 配对结束后仍留在队列中的就是没有找到note_off的note_on事件
+            track_unmatched = sum(len(stack) for stack in active_notes if stack)
             if track_unmatched > 0:
-                print(f"警告: 轨道{track_idx+1}有 {track_unmatched} 个note_on事件没有找到对应的note_off事件")
+                total_unmatched += track_unmatched
+                self._log(f"警告: 轨道{track_idx+1}有 {track_unmatched} 个note_on事件没有找到对应的note_off事件")
         
         if total_unmatched > 0:
-            print(f"总计警告: 有 {total_unmatched} 个note_on事件没有找到对应的note_off事件")
+            self._log(f"总计警告: 有 {total_unmatched} 个note_on事件没有找到对应的note_off事件")
+        
+        # 所有轨道解析完成后，使用速度前缀表一次性计算全部音符的秒位置，记录音符信息（包含原始轨道信息）
+        start_seconds = self._ticks_to_absolute_seconds_batch([pair[4] for pair in note_pairs])
+        end_seconds = self._ticks_to_absolute_seconds_batch([pair[5] for pair in note_pairs])
+        all_notes = [
+            Note(track_idx, note, channel, velocity, start_tick, end_tick, start_sec, end_sec,
+                 original_track=track_idx)
+            for (track_idx, note, channel, velocity, start_tick, end_tick), start_sec, end_sec
+            in zip(note_pairs, start_seconds, end_seconds)
+        ]
         
         # 按开始时间排序
-        all_notes.sort(key=lambda x: x['start_seconds'])
+        all_notes.sort(key=_note_start_seconds)
         
-        print(f"多轨MIDI分析完成: 共收集到 {len(all_notes)} 个音符，分布在 {len(midi.tracks)} 个轨道中")
+        self._log(f"多轨MIDI分析完成: 共收集到 {len(all_notes)} 个音符，分布在 {len(midi.tracks)} 个轨道中")
         
         return all_notes
 
-    def detect_multitrack_overlaps(self, midi_file_path: str) -> Dict[str, Any]:
+    def iter_overlaps(self, midi_or_path) -> Iterator[Dict[str, Any]]:
+        """
+        逐个生成多轨MIDI文件中每处重叠的详细信息
+        
+        与 detect_multitrack_overlaps 的 overlap_details 中的项相同，但不把所有重叠保存在列表里，
+        只需要遍历或计数时（如 sum(1 for _ in processor.iter_overlaps(path))）内存占用不随重叠数量增长
+        
+        Args:
+            midi_or_path: 已加载的MIDI文件对象，或MIDI文件路径
+            
+        Yields:
+            重叠详细信息字典，可用 format_overlap 生成描述文字
+        """
+        midi = self._load_midi(midi_or_path)
+        self._analyze_tempo(midi)
+        all_notes = self.collect_multitrack_note_positions(midi)
+        
+        for note1, note2 in self._iter_overlapping_pairs(all_notes):
+            yield self._make_overlap_detail(note1, note2)
+    
+    @staticmethod
+    def _iter_overlapping_pairs(all_notes: List[Note]) -> Iterator[Tuple[Note, Note]]:
+        """
+        逐对生成同一通道内时间重叠的音符
+        
+        Args:
+            all_notes: 按开始时间排序的音符列表
+            
+        Yields:
+            (note1, note2)，note1 不晚于 note2 开始
+        """
+        # 重叠处理只在同一通道内进行，不同通道的音符同时发声是正常的，
+        # 因此先按通道分组（保持按开始时间排序），只比较同一通道内的音符
+        channel_groups = defaultdict(list)
+        for note in all_notes:
+            channel_groups[note.channel].append(note)
+        
+        for channel_notes in channel_groups.values():
+            # 扫描线：组内音符已按开始时间排序，后面的音符一旦开始于note1结束之后就不会再与note1重叠
+            note_count = len(channel_notes)
+            for i in range(note_count):
+                note1 = channel_notes[i]
+                note1_start = note1.start_seconds
+                note1_end = note1.end_seconds
+                for j in range(i + 1, note_count):
+                    note2 = channel_notes[j]
+                    if note2.start_seconds >= note1_end:
+                        break
+                    
+                    # 检查时间重叠
+                    if note1_start < note2.end_seconds:
+                        yield note1, note2
+    
+    @staticmethod
+    def _make_overlap_detail(note1: Note, note2: Note) -> Dict[str, Any]:
+        """生成一处重叠的详细信息（只保存原始数值，描述文字在读取时由 format_overlap 生成）"""
+        overlap_start = max(note1.start_seconds, note2.start_seconds)
+        overlap_end = min(note1.end_seconds, note2.end_seconds)
+        return {
+            'note1': note1,
+            'note2': note2,
+            'overlap_start': overlap_start,
+            'overlap_end': overlap_end,
+            'overlap_duration': overlap_end - overlap_start,
+            'same_track': note1.original_track == note2.original_track,
+            'same_note': note1.note == note2.note,
+            'same_channel': True  # 只比较同一通道内的音符
+        }
+
+    def detect_multitrack_overlaps(self, midi_or_path, details: bool = True) -> Dict[str, Any]:
         """
         检测多轨MIDI文件中的重叠情况
         
+        只统计同一通道内的重叠（与 fix_multitrack_overlapping_notes 按通道处理的范围一致），
+        不同通道的音符同时发声不算重叠。overlaps 中的描述文字在读取时才格式化（见 format_overlap），
+        只需要逐个处理重叠时可以用 iter_overlaps
+        
         Args:
-            midi_file_path: MIDI文件路径
+            midi_or_path: 已加载的MIDI文件对象，或MIDI文件路径
+            details: 是否记录每处重叠的详细信息；为False时只统计数量，
+                overlaps/overlap_details 返回空列表
             
         Returns:
             包含重叠检测结果的字典
         """
         try:
-            # 加载MIDI文件
-            midi = mido.MidiFile(midi_file_path)
+            # 加载MIDI文件（已加载的对象直接复用，避免重复解析）
+            midi = self._load_midi(midi_or_path)
             self._analyze_tempo(midi)
             
             # 收集所有轨道的音符
@@ -1516,81 +1950,34 @@ class MidiProcessor:
                 }
             
             # 检测重叠
-            overlaps = []
             overlap_details = []
+            same_track_count = 0
+            cross_track_count = 0
             
-            print(f"开始检测 {len(all_notes)} 个音符之间的重叠...")
+            self._log(f"开始检测 {len(all_notes)} 个音符之间的重叠...")
             
-            for i in range(len(all_notes)):
-                for j in range(i + 1, len(all_notes)):
-                    note1 = all_notes[i]
-                    note2 = all_notes[j]
-                    
-                    # 检查时间重叠
-                    if (note1['start_seconds'] < note2['end_seconds'] and 
-                        note2['start_seconds'] < note1['end_seconds']):
-                        
-                        overlap_start = max(note1['start_seconds'], note2['start_seconds'])
-                        overlap_end = min(note1['end_seconds'], note2['end_seconds'])
-                        overlap_duration = overlap_end - overlap_start
-                        
-                        # 格式化时间
-                        start1 = f"{int(note1['start_seconds']//60):02d}:{int(note1['start_seconds']%60):02d}.{int((note1['start_seconds']%1)*1000):03d}"
-                        end1 = f"{int(note1['end_seconds']//60):02d}:{int(note1['end_seconds']%60):02d}.{int((note1['end_seconds']%1)*1000):03d}"
-                        start2 = f"{int(note2['start_seconds']//60):02d}:{int(note2['start_seconds']%60):02d}.{int((note2['start_seconds']%1)*1000):03d}"
-                        end2 = f"{int(note2['end_seconds']//60):02d}:{int(note2['end_seconds']%60):02d}.{int((note2['end_seconds']%1)*1000):03d}"
-                        overlap_start_fmt = f"{int(overlap_start//60):02d}:{int(overlap_start%60):02d}.{int((overlap_start%1)*1000):03d}"
-                        overlap_end_fmt = f"{int(overlap_end//60):02d}:{int(overlap_end%60):02d}.{int((overlap_end%1)*1000):03d}"
-                        
-                        # 判断重叠类型
-                        same_track = note1['original_track'] == note2['original_track']
-                        same_note = note1['note'] == note2['note']
-                        same_channel = note1['channel'] == note2['channel']
-                        
-                        track_info = f"轨道{note1['original_track']+1}" if same_track else f"轨道{note1['original_track']+1} vs 轨道{note2['original_track']+1}"
-                        overlap_type = "同音符" if same_note else "不同音符"
-                        
-                        overlap_desc = (
-                            f"{track_info}: "
-                            f"音符{note1['note']} [{start1}-{end1}] vs "
-                            f"音符{note2['note']} [{start2}-{end2}] "
-                            f"重叠[{overlap_start_fmt}-{overlap_end_fmt}] "
-                            f"持续{overlap_duration:.3f}s ({overlap_type})"
-                        )
-                        
-                        overlaps.append(overlap_desc)
-                        
-                        # 详细重叠信息
-                        overlap_detail = {
-                            'note1': note1,
-                            'note2': note2,
-                            'overlap_start': overlap_start,
-                            'overlap_end': overlap_end,
-                            'overlap_duration': overlap_duration,
-                            'same_track': same_track,
-                            'same_note': same_note,
-                            'same_channel': same_channel,
-                            'track_info': track_info,
-                            'overlap_type': overlap_type,
-                            'description': overlap_desc
-                        }
-                        
-                        overlap_details.append(overlap_detail)
+            for note1, note2 in self._iter_overlapping_pairs(all_notes):
+                if note1.original_track == note2.original_track:
+                    same_track_count += 1
+                else:
+                    cross_track_count += 1
+                
+                # 只需要数量时不记录详细信息
+                if details:
+                    overlap_details.append(self._make_overlap_detail(note1, note2))
             
-            # 统计不同类型的重叠
-            same_track_count = len([o for o in overlap_details if o['same_track']])
-            cross_track_count = len([o for o in overlap_details if not o['same_track']])
+            total_overlaps = same_track_count + cross_track_count
             
-            print(f"重叠检测完成: 共发现 {len(overlaps)} 个重叠")
-            print(f"  同轨道重叠: {same_track_count} 个")
-            print(f"  跨轨道重叠: {cross_track_count} 个")
+            self._log(f"重叠检测完成: 共发现 {total_overlaps} 个重叠")
+            self._log(f"  同轨道重叠: {same_track_count} 个")
+            self._log(f"  跨轨道重叠: {cross_track_count} 个")
             
             return {
-                'has_overlap': len(overlaps) > 0,
-                'total_overlaps': len(overlaps),
+                'has_overlap': total_overlaps > 0,
+                'total_overlaps': total_overlaps,
                 'same_track_overlaps': same_track_count,
                 'cross_track_overlaps': cross_track_count,
-                'overlaps': overlaps,
+                'overlaps': OverlapDescriptions(overlap_details, self.format_overlap),
                 'overlap_details': overlap_details,
                 'all_notes': all_notes
             }
@@ -1608,8 +1995,8 @@ class MidiProcessor:
                 'overlap_details': []
             }
 
-    def fix_multitrack_overlapping_notes(self, all_notes: List[Dict[str, Any]], 
-                                       fix_cross_track: bool = True) -> List[Dict[str, Any]]:
+    def fix_multitrack_overlapping_notes(self, all_notes: List[Note], 
+                                       fix_cross_track: bool = True) -> List[Note]:
         """
         处理多轨MIDI中的重叠音符
         
@@ -1623,89 +2010,80 @@ class MidiProcessor:
         if not all_notes:
             return all_notes
         
-        print(f"开始处理多轨MIDI重叠: {len(all_notes)} 个音符")
-        print(f"跨轨道重叠处理: {'启用' if fix_cross_track else '禁用'}")
+        self._log(f"开始处理多轨MIDI重叠: {len(all_notes)} 个音符")
+        self._log(f"跨轨道重叠处理: {'启用' if fix_cross_track else '禁用'}")
         
-        # 创建音符副本以避免修改原始数据
+        # 创建音符副本以避免修改原始数据（唯一一次复制，后续各阶段都直接修改这些副本）
         processed_notes = [note.copy() for note in all_notes]
         
         if fix_cross_track:
             # 全局处理：将所有音符作为一个整体处理重叠
-            print("使用全局重叠处理模式")
+            self._log("使用全局重叠处理模式")
             
             # 按通道分组处理
-            channel_groups = {}
+            channel_groups = defaultdict(list)
             for note in processed_notes:
-                channel = note['channel']
-                if channel not in channel_groups:
-                    channel_groups[channel] = []
-                channel_groups[channel].append(note)
+                channel_groups[note.channel].append(note)
             
             fixed_notes = []
             
             for channel, notes in channel_groups.items():
-                print(f"处理通道 {channel}: {len(notes)} 个音符（跨轨道模式）")
+                self._log(f"处理通道 {channel}: {len(notes)} 个音符（跨轨道模式）")
                 
-                # 按开始时间排序
-                sorted_notes = sorted(notes, key=lambda x: x['start_seconds'])
-                
-                # 使用扫描线算法处理重叠
-                channel_fixed = self._fix_channel_overlaps(sorted_notes)
+                # 使用扫描线算法处理重叠（_fix_channel_overlaps 内部按开始时间排序）
+                channel_fixed = self._fix_channel_overlaps(notes)
                 fixed_notes.extend(channel_fixed)
                 
         else:
             # 分轨道处理：只处理每个轨道内部的重叠
-            print("使用分轨道重叠处理模式")
+            self._log("使用分轨道重叠处理模式")
             
             # 按轨道分组
-            track_groups = {}
+            track_groups = defaultdict(list)
             for note in processed_notes:
-                track = note['original_track']
-                if track not in track_groups:
-                    track_groups[track] = []
-                track_groups[track].append(note)
+                track_groups[note.original_track].append(note)
             
             fixed_notes = []
             
             for track, track_notes in track_groups.items():
-                print(f"处理轨道 {track+1}: {len(track_notes)} 个音符")
+                self._log(f"处理轨道 {track+1}: {len(track_notes)} 个音符")
                 
                 # 按通道分组处理该轨道内的音符
-                channel_groups = {}
+                channel_groups = defaultdict(list)
                 for note in track_notes:
-                    channel = note['channel']
-                    if channel not in channel_groups:
-                        channel_groups[channel] = []
-                    channel_groups[channel].append(note)
+                    channel_groups[note.channel].append(note)
                 
                 for channel, notes in channel_groups.items():
                     if len(notes) > 1:
-                        print(f"  轨道{track+1}通道{channel}: {len(notes)} 个音符")
-                        
-                        # 按开始时间排序
-                        sorted_notes = sorted(notes, key=lambda x: x['start_seconds'])
+                        self._log(f"  轨道{track+1}通道{channel}: {len(notes)} 个音符")
                         
-                        # 使用扫描线算法处理重叠
-                        channel_fixed = self._fix_channel_overlaps(sorted_notes)
+                        # 使用扫描线算法处理重叠（_fix_channel_overlaps 内部按开始时间排序）
+                        channel_fixed = self._fix_channel_overlaps(notes)
                         fixed_notes.extend(channel_fixed)
                     else:
                         fixed_notes.extend(notes)
         
         # 按开始时间重新排序
-        fixed_notes.sort(key=lambda x: x['start_seconds'])
+        fixed_notes.sort(key=_note_start_seconds)
         
-        print(f"多轨重叠处理完成：{len(all_notes)} 个音符 -> {len(fixed_notes)} 个音符")
+        self._log(f"多轨重叠处理完成：{len(all_notes)} 个音符 -> {len(fixed_notes)} 个音符")
         return fixed_notes
     
-    def _fix_channel_overlaps(self, notes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _fix_channel_overlaps(self, notes: List[Note]) -> List[Note]:
         """
         处理单个通道中的音符重叠
         
-        修复后的算法：
+        算法（单次扫描）：
         1. 按开始时间排序
-        2. 首先处理相同音符之间的重叠（优先级最高）
-        3. 然后处理不同音符之间的重叠
-        4. 确保同一时间点只有一个音符在播放（对于相同音符）
+        2. 依次比较相邻音符，前一个音符与后一个重叠时裁剪到后一个音符的开始时间，后一个音符保持完整
+           （同音高的下一个实例不会早于相邻的下一个音符开始，因此相同音符的重叠也一并处理，
+           同一时间点只有一个音符在播放）
+        3. 删除持续时间小于等于1ms的音符
+        
+        本身就过短的音符（如同一tick开始和结束的重新触发）不裁剪其他音高的音符，
+        但仍会在其开始处结束同音高的前一个音符，扫描结束后再删除
+        
+        传入的音符会被原地裁剪，需要保留原始数据时由调用方先复制
         
         Args:
             notes: 已按开始时间排序的音符列表
@@ -1716,243 +2094,73 @@ class MidiProcessor:
         if not notes:
             return []
         
-        # 复制音符列表以避免修改原始数据
-        working_notes = [note.copy() for note in notes]
-        
-        # 按开始时间排序
-        working_notes.sort(key=lambda x: x['start_seconds'])
-        
-        print(f"开始处理 {len(working_notes)} 个音符...")
-        
-        # 第一阶段：处理相同音符之间的重叠
-        print("第一阶段：处理相同音符重叠")
-        working_notes = self._fix_same_note_overlaps_corrected(working_notes)
-        
-        # 第二阶段：处理不同音符之间的重叠  
-        print("第二阶段：处理不同音符重叠")
-        working_notes = self._fix_different_note_overlaps(working_notes)
+        self._log(f"开始处理 {len(notes)} 个音符...")
         
-        print(f"处理完成: {len(working_notes)} 个音符")
-        return working_notes
-    
-    def _fix_same_note_overlaps_corrected(self, notes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """
-        修正后的相同音符重叠处理
+        min_duration = _MIN_NOTE_DURATION
+        debug_mode = self.debug_mode
+        has_short_notes = False  # 是否有音符被裁剪到过短
         
-        关键修正：确保只有真正重叠的相同音符才被处理
-        """
-        working_notes = notes.copy()
-        
-        # 按音符分组
-        note_groups = {}
-        for i, note in enumerate(working_notes):
-            note_value = note['note']
-            if note_value not in note_groups:
-                note_groups[note_value] = []
-            note_groups[note_value].append((i, note))
-        
-        # 对于每个音符组，处理重叠
-        for note_value, note_list in note_groups.items():
-            if len(note_list) < 2:
-                continue  # 只有一个音符，无需处理
-            
-            print(f"处理音符 {note_value} 的 {len(note_list)} 个实例")
-            
-            # 按开始时间排序这个音符的所有实例
-            note_list.sort(key=lambda x: x[1]['start_seconds'])
-            
-            # 检查并处理重叠 - 关键修正：确保只处理真正重叠的音符
-            for i in range(len(note_list) - 1):
-                current_idx, current_note = note_list[i]
-                next_idx, next_note = note_list[i + 1]
-                
-                # 检查是否真的重叠（关键修正）
-                if current_note['end_seconds'] > next_note['start_seconds']:
-                    old_end = current_note['end_seconds']
-                    
-                    print(f"检测到相同音符{note_value}重叠: [{current_note['start_seconds']:.6f}-{current_note['end_seconds']:.6f}] vs [{next_note['start_seconds']:.6f}-{next_note['end_seconds']:.6f}]")
-                    
-                    # 裁剪前一个音符
-                    current_note['end_seconds'] = next_note['start_seconds']
-                    current_note['duration_seconds'] = current_note['end_seconds'] - current_note['start_seconds']
-                    
-                    # 重新计算ticks
-                    if current_note['duration_ticks'] > 0 and old_end > current_note['start_seconds']:
-                        tick_ratio = current_note['duration_seconds'] / (old_end - current_note['start_seconds'])
-                        current_note['duration_ticks'] = int(current_note['duration_ticks'] * tick_ratio)
-                        current_note['end_tick'] = current_note['start_tick'] + current_note['duration_ticks']
-                    
-                    print(f"相同音符重叠处理: 音符{note_value} 从 {old_end:.6f}s 裁剪到 {current_note['end_seconds']:.6f}s")
-                    
-                    # 更新working_notes中的音符
-                    working_notes[current_idx] = current_note
-                else:
-                    print(f"音符{note_value}无重叠: {current_note['end_seconds']:.6f} <= {next_note['start_seconds']:.6f}")
-        
-        # 删除持续时间过短的音符
-        working_notes = [note for note in working_notes if note['duration_seconds'] > 0.001]
-        
-        return working_notes
-    
-    def _fix_same_note_overlaps(self, notes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """
-        处理相同音符之间的重叠
-        
-        策略：
-        - 相同音符重叠时，前一个音符被裁剪到后一个音符的开始时间
-        - 后一个音符保持完整
-        """
-        working_notes = notes.copy()
-        
-        # 按音符分组
-        note_groups = {}
-        for i, note in enumerate(working_notes):
-            note_value = note['note']
-            if note_value not in note_groups:
-                note_groups[note_value] = []
-            note_groups[note_value].append((i, note))
-        
-        # 对于每个音符组，处理重叠
-        for note_value, note_list in note_groups.items():
-            if len(note_list) < 2:
-                continue  # 只有一个音符，无需处理
-            
-            print(f"处理音符 {note_value} 的 {len(note_list)} 个实例")
-            
-            # 按开始时间排序这个音符的所有实例
-            note_list.sort(key=lambda x: x[1]['start_seconds'])
-            
-            # 检查并处理重叠
-            for i in range(len(note_list) - 1):
-                current_idx, current_note = note_list[i]
-                next_idx, next_note = note_list[i + 1]
-                
-                # 检查是否重叠
-                if current_note['end_seconds'] > next_note['start_seconds']:
-                    old_end = current_note['end_seconds']
-                    
-                    # 裁剪前一个音符
-                    current_note['end_seconds'] = next_note['start_seconds']
-                    current_note['duration_seconds'] = current_note['end_seconds'] - current_note['start_seconds']
-                    
-                    # 重新计算ticks
-                    if current_note['duration_ticks'] > 0 and old_end > current_note['start_seconds']:
-                        tick_ratio = current_note['duration_seconds'] / (old_end - current_note['start_seconds'])
-                        current_note['duration_ticks'] = int(current_note['duration_ticks'] * tick_ratio)
-                        current_note['end_tick'] = current_note['start_tick'] + current_note['duration_ticks']
-                    
-                    print(f"相同音符重叠处理: 音符{note_value} 从 {old_end:.3f}s 裁剪到 {current_note['end_seconds']:.3f}s")
-                    
-                    # 更新working_notes中的音符
-                    working_notes[current_idx] = current_note
-        
-        # 删除持续时间过短的音符
-        working_notes = [note for note in working_notes if note['duration_seconds'] > 0.001]
-        
-        return working_notes
-    
-    def _fix_different_note_overlaps(self, notes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """
-        处理不同音符之间的重叠
-        
-        策略：
-        - 不同音符重叠时，前一个音符被裁剪到后一个音符的开始时间
-        - 后一个音符保持完整
-        """
-        working_notes = notes.copy()
-        working_notes.sort(key=lambda x: x['start_seconds'])
-        
-        # 使用两两比较处理不同音符之间的重叠
-        i = 0
-        while i < len(working_notes) - 1:
-            current_note = working_notes[i]
-            next_note = working_notes[i + 1]
-            
-            # 只处理不同音符之间的重叠
-            if (current_note['note'] != next_note['note'] and
-                current_note['start_seconds'] < next_note['end_seconds'] and 
-                next_note['start_seconds'] < current_note['end_seconds']):
-                
-                old_end = current_note['end_seconds']
-                
-                # 裁剪前一个音符
-                current_note['end_seconds'] = next_note['start_seconds']
-                current_note['duration_seconds'] = current_note['end_seconds'] - current_note['start_seconds']
-                
-                # 重新计算ticks
-                if current_note['duration_ticks'] > 0 and old_end > current_note['start_seconds']:
-                    tick_ratio = current_note['duration_seconds'] / (old_end - current_note['start_seconds'])
-                    current_note['duration_ticks'] = int(current_note['duration_ticks'] * tick_ratio)
-                    current_note['end_tick'] = current_note['start_tick'] + current_note['duration_ticks']
-                
-                print(f"不同音符重叠处理: 音符{current_note['note']} 从 {old_end:.3f}s 裁剪到 {current_note['end_seconds']:.3f}s，为音符{next_note['note']}让路")
-                
-                # 如果裁剪后太短，删除该音符
-                if current_note['duration_seconds'] <= 0.001:
-                    print(f"删除过短音符: {current_note['note']} (持续 {current_note['duration_seconds']:.6f}s)")
-                    working_notes.pop(i)
-                    continue  # 不增加i，因为列表长度变了
-                
-                # 更新working_notes中的值
-                working_notes[i] = current_note
+        def clip(current_note, next_note):
+            """把current_note裁剪到next_note的开始时间（有重叠时），返回裁剪后是否过短"""
+            next_start = next_note.start_seconds
+            if current_note.end_seconds <= next_start:
+                return False  # 无重叠
             
-            i += 1
-        
-        return working_notes
-    
-    def test_overlap_fix(self):
-        """
-        测试重叠处理算法
-        """
-        # 创建测试数据：两个相同的C4音符重叠
-        test_notes = [
-            {
-                'note': 60,  # C4
-                'channel': 0,
-                'start_seconds': 0.0,
-                'end_seconds': 2.0,
-                'duration_seconds': 2.0,
-                'start_tick': 0,
-                'end_tick': 1000,
-                'duration_ticks': 1000,
-                'velocity': 80
-            },
-            {
-                'note': 60,  # C4
-                'channel': 0,
-                'start_seconds': 1.0,
-                'end_seconds': 3.0,
-                'duration_seconds': 2.0,
-                'start_tick': 500,
-                'end_tick': 1500,
-                'duration_ticks': 1000,
-                'velocity': 80
-            }
-        ]
-        
-        print("\n===== 测试重叠处理算法 =====")
-        print("原始数据:")
-        for i, note in enumerate(test_notes):
-            print(f"  音符{i+1}: {note['note']} [{note['start_seconds']:.1f}s - {note['end_seconds']:.1f}s] 持续 {note['duration_seconds']:.1f}s")
-        
-        result = self._fix_channel_overlaps(test_notes)
+            old_end = current_note.end_seconds
+            
+            # 裁剪前一个音符
+            current_note.end_seconds = next_start
+            current_note.duration_seconds = next_start - current_note.start_seconds
+            
+            # 重新计算ticks
+            if current_note.duration_ticks > 0 and old_end > current_note.start_seconds:
+                tick_ratio = current_note.duration_seconds / (old_end - current_note.start_seconds)
+                current_note.duration_ticks = int(current_note.duration_ticks * tick_ratio)
+                current_note.end_tick = current_note.start_tick + current_note.duration_ticks
+            
+            if debug_mode:
+                print(f"重叠处理: 音符{current_note.note} 从 {old_end:.6f}s 裁剪到 {next_start:.6f}s，为音符{next_note.note}让路")
+            
+            return current_note.duration_seconds <= min_duration
         
-        print("处理结果:")
-        for i, note in enumerate(result):
-            print(f"  音符{i+1}: {note['note']} [{note['start_seconds']:.1f}s - {note['end_seconds']:.1f}s] 持续 {note['duration_seconds']:.1f}s")
+        # 按开始时间排序（只复制列表，不复制音符）
+        working_notes = []
+        last_by_pitch = [None] * 128  # 每个音高最近开始的音符（包括过短的音符）
+        for note in sorted(notes, key=_note_start_seconds):
+            pitch = note.note
+            same_pitch_note = last_by_pitch[pitch]
+            last_by_pitch[pitch] = note
+            
+            if note.duration_seconds <= min_duration:
+                # 过短的音符只作为同音高前一个音符的结束点，不放入结果
+                if same_pitch_note is not None and clip(same_pitch_note, note):
+                    has_short_notes = True
+                continue
+            
+            if working_notes and clip(working_notes[-1], note):
+                has_short_notes = True
+            working_notes.append(note)
         
-        # 验证结果
-        if len(result) == 2:
-            note1, note2 = result[0], result[1]
-            if (note1['end_seconds'] == note2['start_seconds'] and 
-                note1['start_seconds'] == 0.0 and note1['end_seconds'] == 1.0 and
-                note2['start_seconds'] == 1.0 and note2['end_seconds'] == 3.0):
-                print("✅ 测试通过！重叠处理正确")
-            else:
-                print("❌ 测试失败！结果不正确")
-        else:
-            print(f"❌ 测试失败！预期2个音符，实际得到{len(result)}个")
+        # 删除裁剪后过短的音符（没有音符被裁剪到过短时不需要再遍历一遍）
+        if has_short_notes:
+            working_notes = [note for note in working_notes if note.duration_seconds > min_duration]
         
-        print("===== 测试结束 =====\n") 
+        self._log(f"处理完成: {len(working_notes)} 个音符")
+        return working_notes
 
 
+def _process_one(task: Tuple[str, str, Dict[str, Any]]) -> ProcessResult:
+    """
+    进程池中处理单个文件（模块级函数，便于pickle传给子进程）
+    
+    子进程的输出不会进入界面日志，因此关闭详细日志，避免大量输出拖慢处理。
+    
+    Args:
+        task: (输入文件路径, 输出目录, 处理选项)
+        
+    Returns:
+        ProcessResult 处理结果
+    """
+    input_path, target_dir, options = task
+    processor = MidiProcessor(debug_mode=False)
+    return processor.process_file(input_path, target_dir, **options)
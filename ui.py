@@ -6,7 +6,7 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QH
                            QTableWidget, QTableWidgetItem, QHeaderView, QCheckBox, 
                            QMessageBox, QGroupBox, QFormLayout, QTextEdit, QSplitter,
                            QTabWidget, QDialog, QSpinBox, QDoubleSpinBox, QScrollArea)
-from PyQt5.QtCore import Qt, pyqtSignal, QThread
+from PyQt5.QtCore import Qt, pyqtSignal, QThread, QTimer
 from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QFont, QIntValidator, QIcon
 
 from midi_processor import MidiProcessor
@@ -21,14 +21,14 @@ except ImportError:
 class WorkerThread(QThread):
     """处理MIDI文件的工作线程"""
     update_progress = pyqtSignal(int, int)  # 当前进度，总数
-    update_result = pyqtSignal(dict)        # 处理结果
+    update_result = pyqtSignal(object)      # 处理结果(ProcessResult)
     update_log = pyqtSignal(str)            # 日志信息
     finished = pyqtSignal()                 # 处理完成信号
     
     def __init__(self, processor, files=None, input_dir=None, output_dir=None, 
                 target_bpm=120.0, remove_cc=True, set_velocity=True, velocity_percent=80,
                 skip_matched=True, keep_original_tempo=False, check_overlap=False, fix_overlap=False,
-                multitrack_overlap=False):
+                multitrack_overlap=False, max_workers=None):
         super().__init__()
         self.processor = processor
         self.files = files or []
@@ -43,6 +43,8 @@ class WorkerThread(QThread):
         self.check_overlap = check_overlap
         self.fix_overlap = fix_overlap
         self.multitrack_overlap = multitrack_overlap
+        # 批量处理的并行进程数（默认使用全部CPU核心）
+        self.max_workers = max_workers or os.cpu_count() or 1
         
         # 重定向标准输出
         self.old_stdout = sys.stdout
@@ -61,41 +63,49 @@ class WorkerThread(QThread):
         try:
             # 处理单个文件列表
             if self.files:
-                total = len(self.files)
-                for i, file_path in enumerate(self.files):
-                    # 记录日志
-                    self.update_log.emit(f"正在处理: {os.path.basename(file_path)}")
-                    
-                    # 确保输出目录存在
-                    if not os.path.exists(self.output_dir):
-                        os.makedirs(self.output_dir, exist_ok=True)
-                    
-                    # 处理文件
-                    result = self.processor.process_file(
-                        file_path, 
-                        self.output_dir, 
-                        self.target_bpm, 
-                        self.remove_cc, 
-                        self.set_velocity,
-                        self.velocity_percent,
-                        self.skip_matched,
-                        self.keep_original_tempo,
-                        self.check_overlap,
-                        self.fix_overlap,
-                        self.multitrack_overlap
-                    )
-                    
+                # 并行处理时多个文件同时进行，只记录完成结果，不提示"正在处理"
+                sequential = self.max_workers <= 1 or len(self.files) <= 1
+                if sequential:
+                    self.update_log.emit(f"正在处理: {os.path.basename(self.files[0])}")
+                
+                def on_file_done(index, total, result):
                     # 发送进度和结果信号
-                    self.update_progress.emit(i + 1, total)
+                    self.update_progress.emit(index, total)
                     self.update_result.emit(result)
                     
                     # 记录处理结果
-                    self.update_log.emit(f"处理完成: {result['filename']} - 状态: {result['status']}")
+                    self.update_log.emit(f"处理完成: {result.filename} - 状态: {result.status}")
+                    if sequential and index < total:
+                        self.update_log.emit(f"正在处理: {os.path.basename(self.files[index])}")
+                
+                # 处理文件（后台预读下一个文件）
+                self.processor.process_files(
+                    self.files,
+                    self.output_dir,
+                    progress_callback=on_file_done,
+                    max_workers=self.max_workers,
+                    target_bpm=self.target_bpm,
+                    remove_cc=self.remove_cc,
+                    set_velocity=self.set_velocity,
+                    velocity_percent=self.velocity_percent,
+                    skip_matched=self.skip_matched,
+                    keep_original_tempo=self.keep_original_tempo,
+                    check_overlap=self.check_overlap,
+                    fix_overlap=self.fix_overlap,
+                    multitrack_overlap=self.multitrack_overlap
+                )
             
             # 处理整个目录
             elif self.input_dir:
                 self.update_log.emit(f"扫描目录: {self.input_dir}")
-                results = self.processor.process_directory(
+                
+                def on_dir_file_done(index, total, result):
+                    # 每个文件处理完成后立即发送进度和结果信号
+                    self.update_progress.emit(index, total)
+                    self.update_result.emit(result)
+                    self.update_log.emit(f"处理完成: {result.filename} - 状态: {result.status}")
+                
+                self.processor.process_directory(
                     self.input_dir,
                     self.output_dir,
                     self.target_bpm,
@@ -106,13 +116,10 @@ class WorkerThread(QThread):
                     self.keep_original_tempo,
                     self.check_overlap,
                     self.fix_overlap,
-                    self.multitrack_overlap
+                    self.multitrack_overlap,
+                    max_workers=self.max_workers,
+                    progress_callback=on_dir_file_done
                 )
-                
-                # 发送进度和结果信号
-                for i, result in enumerate(results):
-                    self.update_progress.emit(i + 1, len(results))
-                    self.update_result.emit(result)
         finally:
             # 恢复标准输出
             sys.stdout = self.old_stdout
@@ -163,13 +170,11 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("MIDI处理工具")
         self.setMinimumSize(1000, 700)
         
-        # 设置窗口图标
-        icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icon.ico')
-        if os.path.exists(icon_path):
-            self.setWindowIcon(QIcon(icon_path))
+        # 窗口图标延迟到事件循环首次绘制之后再加载
+        QTimer.singleShot(0, self._apply_icon)
         
         # 初始化处理器
-        self.processor = MidiProcessor()
+        self.processor = MidiProcessor(debug_mode=True)  # 详细日志显示在界面日志区
         
         # 初始化界面
         self.init_ui()
@@ -182,6 +187,14 @@ class MainWindow(QMainWindow):
         # 存储处理结果
         self.processed_results = []
     
+    def _apply_icon(self):
+        """加载并设置应用程序和窗口图标"""
+        icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icon.ico')
+        if os.path.exists(icon_path):
+            icon = QIcon(icon_path)
+            QApplication.instance().setWindowIcon(icon)
+            self.setWindowIcon(icon)
+    
     def init_ui(self):
         # 创建中心部件和主布局
         central_widget = QWidget()
@@ -535,19 +548,19 @@ class MainWindow(QMainWindow):
         self.result_table.insertRow(row)
         
         # 填充表格数据
-        self.result_table.setItem(row, 0, QTableWidgetItem(result["filename"]))
+        self.result_table.setItem(row, 0, QTableWidgetItem(result.filename))
         
         # 显示原始速度 - 优化多速度显示格式
-        if "tempo_changes" in result and result["tempo_changes"]:
+        if result.tempo_changes:
             tempos = []
-            for tempo_info in result["tempo_changes"]:
+            for tempo_info in result.tempo_changes:
                 bpm = tempo_info["bpm"]
                 if isinstance(bpm, (int, float)):
                     tempos.append(f"{bpm:.1f}")
             
             if tempos:
                 # 检查是否为变速MIDI
-                is_multi_tempo = result.get("is_multi_tempo", False)
+                is_multi_tempo = result.is_multi_tempo
                 prefix = "[变速] " if is_multi_tempo else ""
                 
                 if len(tempos) > 1:
@@ -556,40 +569,29 @@ class MainWindow(QMainWindow):
                 else:
                     tempo_text = prefix + tempos[0] + " BPM"
             else:
-                tempo_text = str(result["original_bpm"]) + " BPM"
+                tempo_text = str(result.original_bpm) + " BPM"
         else:
-            tempo_text = str(result["original_bpm"]) + " BPM"
+            tempo_text = str(result.original_bpm) + " BPM"
             
         self.result_table.setItem(row, 1, QTableWidgetItem(tempo_text))
         
         # 目标速度
-        target_bpm_str = f"{result['target_bpm']:.2f}" if isinstance(result['target_bpm'], (int, float)) else str(result['target_bpm'])
+        target_bpm_str = f"{result.target_bpm:.2f}" if isinstance(result.target_bpm, (int, float)) else str(result.target_bpm)
         self.result_table.setItem(row, 2, QTableWidgetItem(target_bpm_str + " BPM"))
         
         # 音符力度状态
-        if "velocity_status" in result:
-            velocity_status = result["velocity_status"]
-        else:
-            velocity_status = "已处理" if result["velocity_modified"] else "未处理"
-        self.result_table.setItem(row, 3, QTableWidgetItem(velocity_status))
+        self.result_table.setItem(row, 3, QTableWidgetItem(result.velocity_status))
         
         # CC状态
-        if "cc_status" in result:
-            cc_status = result["cc_status"]
-        else:
-            cc_status = "已处理" if result["cc_removed"] else "未处理"
-        self.result_table.setItem(row, 4, QTableWidgetItem(cc_status))
+        self.result_table.setItem(row, 4, QTableWidgetItem(result.cc_status))
         
         # 重叠检测状态
-        if "overlap_status" in result:
-            overlap_status = result["overlap_status"]
-            # 如果有重叠详细信息，添加到显示中
-            if "overlap_details" in result and result["overlap_details"]:
-                overlap_display = f"{overlap_status}\n{result['overlap_details']}"
-            else:
-                overlap_display = overlap_status
+        overlap_status = result.overlap_status
+        # 如果有重叠详细信息，添加到显示中
+        if result.overlap_details:
+            overlap_display = f"{overlap_status}\n{result.overlap_details}"
         else:
-            overlap_display = "未检测"
+            overlap_display = overlap_status
         
         overlap_item = QTableWidgetItem(overlap_display)
         # 检查是否有重叠（包括多轨重叠格式）
@@ -599,10 +601,7 @@ class MainWindow(QMainWindow):
         self.result_table.setItem(row, 5, overlap_item)
         
         # 重叠音符处理状态
-        if "fix_overlap_status" in result:
-            fix_overlap_status = result["fix_overlap_status"]
-        else:
-            fix_overlap_status = "未处理"
+        fix_overlap_status = result.fix_overlap_status
         
         fix_overlap_item = QTableWidgetItem(fix_overlap_status)
         if "已处理" in fix_overlap_status:
@@ -610,14 +609,14 @@ class MainWindow(QMainWindow):
         self.result_table.setItem(row, 6, fix_overlap_item)
         
         # 处理状态
-        status_item = QTableWidgetItem(result["status"])
+        status_item = QTableWidgetItem(result.status)
         self.result_table.setItem(row, 7, status_item)
         
         # 设置状态单元格的颜色
-        if "错误" in result["status"]:
+        if "错误" in result.status:
             status_item.setBackground(Qt.red)
             status_item.setForeground(Qt.white)
-        elif result["status"] == "成功":
+        elif result.status == "成功":
             status_item.setBackground(Qt.green)
             status_item.setForeground(Qt.black)
         # 对于"无需处理"状态，不设置颜色
@@ -685,16 +684,16 @@ class MainWindow(QMainWindow):
             data = []
             for result in self.processed_results:
                 # 获取原始速度字符串
-                if "tempo_changes" in result and result["tempo_changes"]:
+                if result.tempo_changes:
                     tempos = []
-                    for tempo_info in result["tempo_changes"]:
+                    for tempo_info in result.tempo_changes:
                         bpm = tempo_info["bpm"]
                         if isinstance(bpm, (int, float)):
                             tempos.append(f"{bpm:.1f}")
                     
                     if tempos:
                         # 检查是否为变速MIDI
-                        is_multi_tempo = result.get("is_multi_tempo", False)
+                        is_multi_tempo = result.is_multi_tempo
                         prefix = "[变速] " if is_multi_tempo else ""
                         
                         if len(tempos) > 1:
@@ -702,51 +701,28 @@ class MainWindow(QMainWindow):
                         else:
                             tempo_text = prefix + tempos[0] + " BPM"
                     else:
-                        tempo_text = str(result["original_bpm"]) + " BPM"
+                        tempo_text = str(result.original_bpm) + " BPM"
                 else:
-                    tempo_text = str(result["original_bpm"]) + " BPM"
-                
-                # 获取音符力度状态
-                if "velocity_status" in result:
-                    velocity_status = result["velocity_status"]
-                else:
-                    velocity_status = "已处理" if result["velocity_modified"] else "未处理"
-                
-                # 获取CC状态
-                if "cc_status" in result:
-                    cc_status = result["cc_status"]
-                else:
-                    cc_status = "已处理" if result["cc_removed"] else "未处理"
+                    tempo_text = str(result.original_bpm) + " BPM"
                 
                 # 获取重叠检测状态
-                if "overlap_status" in result:
-                    overlap_status = result["overlap_status"]
-                    # 如果有重叠详细信息，添加到导出中
-                    if "overlap_details" in result and result["overlap_details"]:
-                        # 使用分号分隔，避免Excel中的换行符问题
-                        overlap_export = f"{overlap_status}; {result['overlap_details']}"
-                    else:
-                        overlap_export = overlap_status
-                else:
-                    overlap_export = "未检测"
-                
-                # 获取重叠音符处理状态
-                if "fix_overlap_status" in result:
-                    fix_overlap_export = result["fix_overlap_status"]
+                if result.overlap_details:
+                    # 使用分号分隔，避免Excel中的换行符问题
+                    overlap_export = f"{result.overlap_status}; {result.overlap_details}"
                 else:
-                    fix_overlap_export = "未处理"
+                    overlap_export = result.overlap_status
                 
                 data.append({
-                    "文件名": result["filename"],
+                    "文件名": result.filename,
                     "原始速度": tempo_text,
-                    "目标速度": f"{result['target_bpm']:.2f} BPM" if isinstance(result['target_bpm'], (int, float)) else str(result['target_bpm']) + " BPM",
-                    "音符力度": velocity_status,
-                    "删除控制信息": cc_status,
+                    "目标速度": f"{result.target_bpm:.2f} BPM" if isinstance(result.target_bpm, (int, float)) else str(result.target_bpm) + " BPM",
+                    "音符力度": result.velocity_status,
+                    "删除控制信息": result.cc_status,
                     "重叠检测": overlap_export,
-                    "重叠处理": fix_overlap_export,
-                    "状态": result["status"],
-                    "文件路径": result["path"],
-                    "音符数量": result["note_count"]
+                    "重叠处理": result.fix_overlap_status,
+                    "状态": result.status,
+                    "文件路径": result.path,
+                    "音符数量": result.note_count
                 })
             
             # 创建DataFrame并导出